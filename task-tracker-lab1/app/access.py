@@ -0,0 +1,27 @@
+from fastapi import HTTPException
+from sqlalchemy.orm import contains_eager
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Project, Task
+
+
+async def get_owned_project(session: AsyncSession, project_id: int, user_id: int) -> Project:
+    project = await session.get(Project, project_id)
+    if not project or project.owner_id != user_id:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return project
+
+
+async def get_owned_task(session: AsyncSession, task_id: int, user_id: int) -> Task:
+    # задача и владелец проекта одним JOIN; task.project уже загружен
+    stmt = (
+        select(Task)
+        .join(Task.project)
+        .options(contains_eager(Task.project))
+        .where(Task.id == task_id, Project.owner_id == user_id)
+    )
+    task = (await session.exec(stmt)).first()
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
@@ -1,12 +1,19 @@
+import asyncio
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional, Tuple
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from jose import jwt, JWTError
-from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db import engine
+from app import metrics, revocation
+from app.db import get_session
 from app.models import User
 
 import bcrypt
@@ -14,15 +21,56 @@ import bcrypt
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-change-me")
 ALGORITHM = "HS256"
+# jose (python-jose) или pyjwt (PyJWT, заметно быстрее на decode)
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "15"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
 
+# стоимость bcrypt и отдельный пул для хэширования паролей
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+
+# кэш проверенных access-токенов: повторный запрос с тем же токеном не проверяет подпись
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
 security = HTTPBearer()
 
+# bcrypt отпускает GIL, поэтому потоков достаточно; пул отдельный от
+# threadpool FastAPI, чтобы всплеск логинов не занимал его целиком
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_pending = 0
+
+# токен -> (user_id, jti, exp), LRU
+_token_cache: "OrderedDict[str, Tuple[int, Optional[str], float]]" = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+# кэш пользователей: user_id -> (отсоединённый User, expires_at), LRU
+_user_cache: "OrderedDict[int, Tuple[User, float]]" = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+
+def _load_jwt_backend(name: str):
+    if name == "pyjwt":
+        import jwt as pyjwt
+
+        return pyjwt.encode, pyjwt.decode, pyjwt.PyJWTError
+    if name == "jose":
+        from jose import jwt as jose_jwt, JWTError
+
+        return jose_jwt.encode, jose_jwt.decode, JWTError
+    raise ValueError(f"Unknown JWT backend: {name}")
+
+
+_jwt_encode, _jwt_decode, JWTError = _load_jwt_backend(JWT_BACKEND)
+
 
 def get_password_hash(password: str) -> str:
     password_bytes = password.encode("utf-8")
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode("utf-8")
 
@@ -33,35 +81,203 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_bytes, hashed_bytes)
 
 
+def needs_rehash(hashed_password: str) -> bool:
+    # формат bcrypt: $2b$<rounds>$<salt+hash>
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+async def _run_hashing(func, *args):
+    # счётчик меняется только из event loop, блокировка не нужна
+    global _hash_pending
+    if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        metrics.PASSWORD_HASH_REJECTIONS.inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Password hashing is overloaded, retry later",
+            headers={"Retry-After": "1"},
+        )
+
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, _timed_hashing, func, *args)
+    finally:
+        _hash_pending -= 1
+
+
+def _timed_hashing(func, *args):
+    # время самого bcrypt в потоке пула, без ожидания в очереди
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        operation = "verify" if func is verify_password else "hash"
+        metrics.PASSWORD_HASH_DURATION.observe(time.perf_counter() - started, operation)
+
+
+async def hash_password(password: str) -> str:
+    return await _run_hashing(get_password_hash, password)
+
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+metrics.GaugeCallback(
+    "password_hash_pool", "bcrypt executor: operations in flight or queued, and worker count.",
+    lambda: [(("pending",), _hash_pending), (("workers",), PASSWORD_HASH_WORKERS)],
+    ("state",),
+)
+
+
 def create_access_token(subject: str, expires_minutes: int = ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
     expire = datetime.utcnow() + timedelta(minutes=expires_minutes)
-    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # jti нужен для отзыва при logout (app.revocation)
+    to_encode = {"exp": expire, "sub": str(subject), "type": "access", "jti": uuid.uuid4().hex}
+    return _jwt_encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
 def create_refresh_token(subject: str, expires_days: int = REFRESH_TOKEN_EXPIRE_DAYS) -> str:
     expire = datetime.utcnow() + timedelta(days=expires_days)
-    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"}
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # jti нужен для ротации и отзыва (app.revocation)
+    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh", "jti": uuid.uuid4().hex}
+    return _jwt_encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def decode_refresh_token(token: str) -> Optional[Tuple[int, str, float]]:
+    try:
+        payload = _jwt_decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("type") != "refresh":
+            return None
+        return int(payload.get("sub")), str(payload["jti"]), float(payload["exp"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _get_cached_user(user_id: int) -> Optional[User]:
+    with _user_cache_lock:
+        record = _user_cache.get(user_id)
+        if not record:
+            return None
 
+        user, expires_at = record
+        if time.time() > expires_at:
+            _user_cache.pop(user_id, None)
+            return None
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    
-    token = credentials.credentials
+        _user_cache.move_to_end(user_id)
+        return user
+
+
+def _cache_user(user: User):
+    if USER_CACHE_SIZE <= 0:
+        return
+
+    with _user_cache_lock:
+        _user_cache[user.id] = (user, time.time() + USER_CACHE_TTL)
+        _user_cache.move_to_end(user.id)
+        while len(_user_cache) > USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+
+
+def invalidate_user(user_id: int):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
+
+
+def _get_cached_token(token: str) -> Optional[Tuple[int, Optional[str], float]]:
+    with _token_cache_lock:
+        record = _token_cache.get(token)
+        if not record:
+            return None
+
+        if time.time() >= record[2]:
+            _token_cache.pop(token, None)
+            return None
+
+        _token_cache.move_to_end(token)
+        return record
+
+
+def _cache_token(token: str, user_id: int, jti: Optional[str], exp: float):
+    if TOKEN_CACHE_SIZE <= 0:
+        return
+
+    with _token_cache_lock:
+        _token_cache[token] = (user_id, jti, exp)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
+
+def evict_token(token: str):
+    with _token_cache_lock:
+        _token_cache.pop(token, None)
+
+
+def decode_access_claims(token: str) -> Optional[Tuple[int, Optional[str], float]]:
+    # (user_id, jti, exp) по подписи и exp, без проверки отзыва
+    record = _get_cached_token(token)
+    if record is not None:
+        return record
+
+    try:
+        payload = _jwt_decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        if payload.get("type") != "access":
+            return None
+        user_id = int(payload.get("sub"))
+        exp = float(payload["exp"])
+        # у токенов, выданных до появления jti, его нет: они живут не дольше exp
+        jti = payload.get("jti")
+    except (JWTError, KeyError, TypeError, ValueError):
+        return None
+
+    # запись живёт не дольше самого токена
+    _cache_token(token, user_id, jti, exp)
+    return user_id, jti, exp
+
+
+async def authenticate(token: str) -> Optional[int]:
+    # user_id валидного и не отозванного access-токена; отзыв проверяется
+    # и при попадании в кэш, так как logout мог быть в другом воркере
+    claims = decode_access_claims(token)
+    if claims is None:
+        return None
+
+    user_id, jti, _ = claims
+    if jti is not None and await revocation.is_revoked(jti):
+        return None
+    return user_id
+
+
+async def get_current_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    session: AsyncSession = Depends(get_session),
+) -> User:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        if payload.get("type") != "access":
-            raise credentials_exception
 
-        user_id = int(payload.get("sub"))
-        with Session(engine) as session:
-            user = session.get(User, user_id)
-            if not user:
-                raise credentials_exception
-            return user
-    except JWTError:
+    # RateLimitMiddleware уже проверил токен и положил user_id в state
+    user_id = getattr(request.state, "user_id", None)
+    if user_id is None:
+        user_id = await authenticate(credentials.credentials)
+    if user_id is None:
         raise credentials_exception
+
+    user = _get_cached_user(user_id)
+    if user is not None:
+        return user
+
+    user = await session.get(User, user_id)
+    if not user:
+        raise credentials_exception
+
+    # отсоединяем от сессии запроса, чтобы commit обработчика не сбросил атрибуты
+    session.expunge(user)
+    _cache_user(user)
+    return user
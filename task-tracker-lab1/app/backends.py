@@ -0,0 +1,50 @@
+from typing import Any, Callable, Dict, Optional
+
+from anyio import to_thread
+
+# Общая обвязка сменных хранилищ (idempotency, revocation, response cache,
+# rate limit): выбор бэкенда по имени из настроек, подмена хранилища и
+# вызов его методов из async-кода. У хранилища есть атрибут blocking:
+# True — метод ходит в сеть (redis) и выполняется в threadpool, чтобы не
+# блокировать event loop; False — быстрый вызов в памяти процесса.
+
+
+async def call(store, method: str, *args):
+    bound = getattr(store, method)
+    if store.blocking:
+        return await to_thread.run_sync(bound, *args)
+    return bound(*args)
+
+
+def redis_factory(cls, **kwargs) -> Callable[[], Any]:
+    # пакет redis и клиент создаются только если бэкенд выбран
+    def factory():
+        from app.redis_client import get_redis
+
+        return cls(get_redis(), **kwargs)
+
+    return factory
+
+
+class Backend:
+    def __init__(self, kind: str, factories: Dict[str, Callable[[], Any]], backend: str):
+        # factories: имя бэкенда -> конструктор хранилища (None — выключено)
+        self.kind = kind
+        self.factories = factories
+        self.store: Optional[Any] = self.create(backend)
+
+    def create(self, backend: str):
+        factory = self.factories.get(backend)
+        if factory is None:
+            raise ValueError(f"Unknown {self.kind} backend: {backend}")
+        return factory()
+
+    def set(self, store):
+        # старое хранилище закрывается (фоновые потоки и т.п.)
+        previous, self.store = self.store, store
+        close = getattr(previous, "close", None)
+        if close is not None and previous is not store:
+            close()
+
+    async def call(self, method: str, *args):
+        return await call(self.store, method, *args)
@@ -0,0 +1,114 @@
+from typing import Dict
+
+from sqlalchemy import DDL, event
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Comment, Project, StatsCounter, Task, User
+
+# Счётчики /api/internal/stats хранятся в таблице stats_counter, а не
+# считаются COUNT(*) на запрос. Их обновляют триггеры в той же транзакции,
+# что и запись, поэтому учитываются batch INSERT/DELETE мимо ORM, значения
+# общие для всех воркеров и не требуют сверки.
+
+# таблица -> имя счётчика
+COUNTED_TABLES = {
+    "user": "total_users",
+    "project": "total_projects",
+    "task": "total_tasks",
+    "comment": "total_comments",
+}
+STATUS_COUNTER = "tasks_by_status"
+
+_BUMP = (
+    "INSERT INTO stats_counter (name, key, value) VALUES ({name}, {key}, {delta}) "
+    "ON CONFLICT (name, key) DO UPDATE SET value = stats_counter.value + excluded.value"
+)
+
+
+def _sqlite_bump(name: str, key: str, delta: int) -> str:
+    return _BUMP.format(name=f"'{name}'", key=key, delta=delta) + "; "
+
+
+SQLITE_DDL = []
+for _table, _name in COUNTED_TABLES.items():
+    _status = _table == "task"
+    SQLITE_DDL += [
+        f'CREATE TRIGGER IF NOT EXISTS {_table}_counter_ai AFTER INSERT ON "{_table}" BEGIN '
+        + _sqlite_bump(_name, "''", 1)
+        + (_sqlite_bump(STATUS_COUNTER, "new.status", 1) if _status else "")
+        + "END",
+        f'CREATE TRIGGER IF NOT EXISTS {_table}_counter_ad AFTER DELETE ON "{_table}" BEGIN '
+        + _sqlite_bump(_name, "''", -1)
+        + (_sqlite_bump(STATUS_COUNTER, "old.status", -1) if _status else "")
+        + "END",
+    ]
+SQLITE_DDL.append(
+    "CREATE TRIGGER IF NOT EXISTS task_counter_au AFTER UPDATE OF status ON task "
+    "WHEN old.status IS NOT new.status BEGIN "
+    + _sqlite_bump(STATUS_COUNTER, "old.status", -1)
+    + _sqlite_bump(STATUS_COUNTER, "new.status", 1)
+    + "END"
+)
+
+POSTGRES_DDL = [
+    "CREATE OR REPLACE FUNCTION stats_counter_bump(p_name varchar, p_key varchar, p_delta integer) "
+    "RETURNS void AS $$ BEGIN "
+    + _BUMP.format(name="p_name", key="p_key", delta="p_delta") + "; "
+    "END $$ LANGUAGE plpgsql",
+    # TG_ARGV[0] — имя счётчика таблицы
+    "CREATE OR REPLACE FUNCTION stats_counter_trigger() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP = 'INSERT' THEN PERFORM stats_counter_bump(TG_ARGV[0], '', 1); "
+    "ELSE PERFORM stats_counter_bump(TG_ARGV[0], '', -1); END IF; "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE FUNCTION task_status_counter_trigger() RETURNS trigger AS $$ BEGIN "
+    "IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status THEN RETURN NULL; END IF; "
+    f"IF TG_OP IN ('UPDATE', 'DELETE') THEN PERFORM stats_counter_bump('{STATUS_COUNTER}', OLD.status, -1); END IF; "
+    f"IF TG_OP IN ('INSERT', 'UPDATE') THEN PERFORM stats_counter_bump('{STATUS_COUNTER}', NEW.status, 1); END IF; "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql",
+]
+for _table, _name in COUNTED_TABLES.items():
+    POSTGRES_DDL += [
+        f'DROP TRIGGER IF EXISTS {_table}_counter ON "{_table}"',
+        f'CREATE TRIGGER {_table}_counter AFTER INSERT OR DELETE ON "{_table}" '
+        f"FOR EACH ROW EXECUTE FUNCTION stats_counter_trigger('{_name}')",
+    ]
+POSTGRES_DDL += [
+    "DROP TRIGGER IF EXISTS task_status_counter ON task",
+    "CREATE TRIGGER task_status_counter AFTER INSERT OR DELETE OR UPDATE OF status ON task "
+    "FOR EACH ROW EXECUTE FUNCTION task_status_counter_trigger()",
+]
+
+# начальное заполнение из существующих строк (таблица создана на непустой базе)
+BACKFILL = (
+    "INSERT INTO stats_counter (name, key, value) "
+    + " UNION ALL ".join(
+        f"SELECT '{name}', '', count(*) FROM \"{table}\"" for table, name in COUNTED_TABLES.items()
+    )
+    + f" UNION ALL SELECT '{STATUS_COUNTER}', status, count(*) FROM task GROUP BY status"
+)
+
+# новая база (init_db): триггеры создаются вместе с stats_counter, после
+# считаемых таблиц; существующую базу переводит миграция 0006
+for _model in (User, Project, Task, Comment):
+    StatsCounter.__table__.add_is_dependent_on(_model.__table__)
+for _statement in SQLITE_DDL + [BACKFILL]:
+    event.listen(StatsCounter.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in POSTGRES_DDL + [BACKFILL]:
+    event.listen(StatsCounter.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+
+async def snapshot(session: AsyncSession) -> Dict:
+    # несколько строк stats_counter вместо COUNT(*) по таблицам
+    rows = (await session.execute(select(StatsCounter.name, StatsCounter.key, StatsCounter.value))).all()
+    data = {name: 0 for name in COUNTED_TABLES.values()}
+    data[STATUS_COUNTER] = {}
+    for name, key, value in rows:
+        if name == STATUS_COUNTER:
+            if value:
+                data[STATUS_COUNTER][key] = value
+        elif name in data:
+            data[name] = value
+    return data
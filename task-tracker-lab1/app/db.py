@@ -1,10 +1,192 @@
-from sqlmodel import SQLModel, create_engine
 import os
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app import metrics, profiling
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./dev.db")
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args)
+
+# пул соединений (для SQLite-файла и PostgreSQL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_ECHO = os.getenv("DB_ECHO", "0") == "1"
+# PostgreSQL: statement_timeout в мс, 0 — без ограничения
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+# SQLite: WAL и busy_timeout, чтобы параллельные записи ждали, а не падали с "database is locked"
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# один DATABASE_URL на оба движка: драйвер подставляется по диалекту
+_SYNC_DRIVERS = {"sqlite": "sqlite", "postgresql": "postgresql+psycopg2"}
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def _with_driver(url: str, drivers: dict) -> str:
+    parsed = make_url(url)
+    drivername = drivers.get(parsed.get_backend_name(), parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+SYNC_DATABASE_URL = _with_driver(DATABASE_URL, _SYNC_DRIVERS)
+ASYNC_DATABASE_URL = _with_driver(DATABASE_URL, _ASYNC_DRIVERS)
+
+_url = make_url(DATABASE_URL)
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+_SQLITE_MEMORY = IS_SQLITE and _url.database in (None, "", ":memory:")
+
+
+class PoolWaitStats:
+    # сколько раз и как долго запросы ждали свободное соединение
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_seconds_total": round(self.wait_seconds, 6),
+                "wait_seconds_max": round(self.max_wait_seconds, 6),
+            }
+
+
+def _timed_pool(base):
+    stats = PoolWaitStats()
+
+    class TimedPool(base):
+        wait_stats = stats
+
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                self.wait_stats.record(time.perf_counter() - started)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def _engine_kwargs(pool_class) -> dict:
+    kwargs = {"echo": DB_ECHO}
+    if _SQLITE_MEMORY:
+        return kwargs
+
+    kwargs.update(
+        poolclass=_timed_pool(pool_class),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    return kwargs
+
+
+def _connect_args(async_driver: bool) -> dict:
+    if IS_SQLITE:
+        return {"check_same_thread": False}
+    if DB_STATEMENT_TIMEOUT_MS and async_driver:
+        return {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+    if DB_STATEMENT_TIMEOUT_MS:
+        return {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    if not _SQLITE_MEMORY:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+# синхронный движок — для init_db, миграций и служебных скриптов
+engine = create_engine(
+    SYNC_DATABASE_URL,
+    connect_args=_connect_args(async_driver=False),
+    **_engine_kwargs(QueuePool),
+)
+# асинхронный — для обработчиков запросов
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args=_connect_args(async_driver=True),
+    **_engine_kwargs(AsyncAdaptedQueuePool),
+)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+
+def _describe_pool(pool) -> dict:
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats is not None:
+        stats.update(wait_stats.snapshot())
+    return stats
+
+
+def pool_stats() -> dict:
+    return {
+        "async": _describe_pool(async_engine.sync_engine.pool),
+        "sync": _describe_pool(engine.pool),
+    }
+
+
+def _pool_samples():
+    for name, stats in pool_stats().items():
+        for key in ("checked_out", "checked_in", "overflow", "size", "wait_seconds_total", "wait_seconds_max"):
+            if key in stats:
+                yield (name, key), stats[key]
+
+
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+if profiling.SQL_PROFILE:
+    profiling.instrument_engine(engine)
+    profiling.instrument_engine(async_engine.sync_engine)
+metrics.GaugeCallback("db_pool", "Connection pool state (see /api/internal/pool).", _pool_samples, ("engine", "stat"))
+
 
 def init_db():
-    from app import models
+    from app import counters, models, search, summary
     SQLModel.metadata.create_all(engine)
+
+
+# одна сессия на запрос: FastAPI кэширует зависимость, поэтому
+# get_current_user и обработчик получают один и тот же объект.
+# expire_on_commit=False: после commit объекты остаются читаемыми без refresh
+async def get_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
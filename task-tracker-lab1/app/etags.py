@@ -0,0 +1,175 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, NamedTuple, Optional, Sequence, Set
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Comment, Project, Task
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+
+# ETag одного ресурса: "<version>" или "<version>-<хэш>", если в ответ
+# встроены связи (include=); If-Match сравнивает только version.
+# ETag списка: хэш пар (id, version) строк страницы.
+# Last-Modified только у ресурса без связей: max(updated_at) списка или
+# комментариев не сдвигается при удалении строки, и If-Modified-Since
+# давал бы устаревший 304; там проверяется только If-None-Match
+def _digest(value) -> str:
+    raw = json.dumps(value, default=str, separators=(",", ":")).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def resource_validators(version: int, updated_at: Optional[datetime], related: Sequence = ()) -> Validators:
+    # related: версии встроенных связей и штампы комментариев
+    if not related:
+        return Validators(f'"{version}"', updated_at)
+    return Validators(f'"{version}-{_digest([list(r) for r in related])}"', None)
+
+
+def list_validators(rows: Sequence, related: Sequence = ()) -> Validators:
+    # rows: (id, version) строк страницы в порядке выдачи
+    return Validators(f'"{_digest([list(r) for r in rows] + [list(r) for r in related])}"', None)
+
+
+def http_date(value: datetime) -> str:
+    # updated_at хранится в UTC без tzinfo
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def _etag_list(header: str) -> List[str]:
+    return [tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()]
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _etag_list(if_none_match)
+        return "*" in tags or validators.etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        modified = validators.last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        return since.tzinfo is not None and modified <= since
+    return False
+
+
+def _headers(validators: Validators) -> dict:
+    headers = {"ETag": validators.etag}
+    if validators.last_modified is not None:
+        headers["Last-Modified"] = http_date(validators.last_modified)
+    return headers
+
+
+def not_modified(validators: Validators) -> Response:
+    return Response(status_code=304, headers=_headers(validators))
+
+
+def apply_validators(response: Response, validators: Validators):
+    response.headers.update(_headers(validators))
+
+
+def check_if_match(if_match: Optional[str], version: int):
+    # оптимистическая блокировка: PATCH применяется только к той версии,
+    # которую клиент видел; гонку после проверки ловит version_id_col
+    if if_match is None:
+        return
+    tags = _etag_list(if_match)
+    if "*" in tags:
+        return
+    versions = {tag.strip('"').split("-", 1)[0] for tag in tags}
+    if str(version) not in versions:
+        raise HTTPException(status_code=412, detail="Precondition Failed: resource has changed")
+
+
+# облегчённые запросы: только id/version/updated_at, без загрузки строк целиком
+
+async def comments_stamp(session: AsyncSession, task_ids: Sequence[int]) -> tuple:
+    # меняется при добавлении (count, max id), удалении (count) и правке (sum version)
+    stmt = select(
+        func.count(Comment.id),
+        func.coalesce(func.sum(Comment.version), 0),
+        func.max(Comment.id),
+    ).where(Comment.task_id.in_(list(task_ids)))
+    return tuple((await session.exec(stmt)).one())
+
+
+async def task_stamp(session: AsyncSession, task_id: int, user_id: int) -> Optional[tuple]:
+    # (task.version, task.updated_at, project.version) или None
+    stmt = (
+        select(Task.version, Task.updated_at, Project.version)
+        .join(Project, Project.id == Task.project_id)
+        .where(Task.id == task_id, Project.owner_id == user_id)
+    )
+    row = (await session.exec(stmt)).first()
+    return tuple(row) if row else None
+
+
+async def project_stamp(session: AsyncSession, project_id: int, user_id: int) -> Optional[tuple]:
+    stmt = select(Project.version, Project.updated_at).where(
+        Project.id == project_id, Project.owner_id == user_id
+    )
+    row = (await session.exec(stmt)).first()
+    return tuple(row) if row else None
+
+
+async def page_stamp(session: AsyncSession, statement, model) -> List[tuple]:
+    # тот же запрос страницы (фильтры, порядок, limit), но только id и version
+    # execute, а не exec: select(Task) у sqlmodel отдаёт скаляры даже после with_only_columns
+    stmt = statement.with_only_columns(model.id, model.version)
+    return [tuple(row) for row in (await session.execute(stmt)).all()]
+
+
+async def task_validators(
+    session: AsyncSession,
+    parts: Set[str],
+    comments_limit: int,
+    task: Optional[Task] = None,
+    task_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+) -> Optional[Validators]:
+    # по загруженной задаче (task.project загружен get_owned_task) или облегчённым запросом
+    if task is not None:
+        stamp = (task.version, task.updated_at, task.project.version)
+    else:
+        stamp = await task_stamp(session, task_id, user_id)
+        if stamp is None:
+            return None
+
+    related = []
+    if "project" in parts:
+        related.append(stamp[2:])
+    if "comments" in parts:
+        related.append((comments_limit, *await comments_stamp(session, [task_id or task.id])))
+    return resource_validators(stamp[0], stamp[1], related)
+
+
+async def page_validators(
+    session: AsyncSession,
+    rows: Sequence[tuple],
+    parts: Set[str] = frozenset(),
+    comments_limit: int = 0,
+    project: Optional[Project] = None,
+) -> Validators:
+    related = []
+    if "project" in parts and project is not None:
+        related.append((project.version,))
+    if "comments" in parts and rows:
+        related.append((comments_limit, *await comments_stamp(session, [r[0] for r in rows])))
+    return list_validators(rows, related)
@@ -0,0 +1,84 @@
+import csv
+import io
+import json
+import os
+from collections import defaultdict
+from typing import AsyncIterator, List
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import async_engine
+from app.models import Comment, Task
+from app.schemas import CommentRead, TaskReadV2, TaskReadV2WithRelations
+from app.serialization import dump_json
+
+EXPORT_FORMATS = {"ndjson", "csv"}
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# строк за одну выборку курсора; в памяти держится одна пачка
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+
+CSV_COLUMNS = list(TaskReadV2.model_fields)
+
+
+async def iter_task_batches(
+    project_id: int, with_comments: bool, batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[List[TaskReadV2WithRelations]]:
+    # своя сессия: сессия запроса закрывается раньше, чем отдаётся тело ответа
+    async with AsyncSession(async_engine) as session:
+        stmt = (
+            select(Task)
+            .where(Task.project_id == project_id)
+            .order_by(Task.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await session.stream_scalars(stmt)
+        async for tasks in result.partitions():
+            comments = defaultdict(list)
+            if with_comments:
+                comments_stmt = (
+                    select(Comment)
+                    .where(Comment.task_id.in_([t.id for t in tasks]))
+                    .order_by(Comment.task_id, Comment.id)
+                )
+                for comment in await session.exec(comments_stmt):
+                    comments[comment.task_id].append(CommentRead.model_validate(comment))
+
+            batch = []
+            for task in tasks:
+                data = dict(TaskReadV2.model_validate(task))
+                if with_comments:
+                    data["comments"] = comments.get(task.id, [])
+                batch.append(TaskReadV2WithRelations.model_construct(**data))
+
+            # identity map держит строки по слабым ссылкам: после пачки они освобождаются
+            yield batch
+
+
+async def stream_ndjson(project_id: int, with_comments: bool) -> AsyncIterator[bytes]:
+    async for batch in iter_task_batches(project_id, with_comments):
+        yield b"".join(
+            dump_json(TaskReadV2WithRelations, item, exclude_unset=True) + b"\n" for item in batch
+        )
+
+
+async def stream_csv(project_id: int, with_comments: bool) -> AsyncIterator[bytes]:
+    columns = CSV_COLUMNS + (["comments"] if with_comments else [])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    async for batch in iter_task_batches(project_id, with_comments):
+        for item in batch:
+            row = item.model_dump(mode="json", exclude_unset=True)
+            if with_comments:
+                # комментарии задачи — JSON-массив в одной ячейке
+                row["comments"] = json.dumps(row["comments"], ensure_ascii=False)
+            writer.writerow(["" if row.get(c) is None else row[c] for c in columns])
+
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
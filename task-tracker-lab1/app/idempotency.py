@@ -1,25 +1,141 @@
+import hashlib
+import json
+import os
+import threading
 import time
-from typing import Optional, Dict, Any, Tuple
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
 
-# словарь
-_idemp_storage: Dict[str, Tuple[dict, float]] = {}
+from fastapi import HTTPException
+
+from app import metrics
+from app.backends import Backend, redis_factory
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", str(24 * 3600)))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+IDEMPOTENCY_SWEEP_INTERVAL = int(os.getenv("IDEMPOTENCY_SWEEP_INTERVAL", "60"))
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")
+
+
+class MemoryIdempotencyStore:
+    # LRU с ограничением размера; просроченные записи удаляет фоновый поток
+    blocking = False
+
+    def __init__(self, max_keys: int = IDEMPOTENCY_MAX_KEYS, sweep_interval: int = IDEMPOTENCY_SWEEP_INTERVAL):
+        self.max_keys = max_keys
+        self._data: "OrderedDict[str, Tuple[str, Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if sweep_interval > 0:
+            thread = threading.Thread(target=self._sweep_loop, args=(sweep_interval,), daemon=True)
+            thread.start()
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        with self._lock:
+            record = self._data.get(key)
+            if not record:
+                return None
+
+            fingerprint, value, expires_at = record
+            if time.time() > expires_at:
+                self._data.pop(key, None)
+                return None
+
+            self._data.move_to_end(key)
+            return fingerprint, value
+
+    def set(self, key: str, fingerprint: str, value: Any, ttl: int):
+        with self._lock:
+            self._data[key] = (fingerprint, value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, _, expires_at) in self._data.items() if expires_at < now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+    def close(self):
+        self._stop.set()
+
+    def _sweep_loop(self, interval: int):
+        while not self._stop.wait(interval):
+            self.sweep()
+
+
+class RedisIdempotencyStore:
+    # общий для всех воркеров; истечение по TTL делает сам Redis (SET ... EX)
+    blocking = True
+
+    def __init__(self, client, prefix: str = "idemp:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+
+        record = json.loads(raw)
+        return record["fingerprint"], record["value"]
+
+    def set(self, key: str, fingerprint: str, value: Any, ttl: int):
+        raw = json.dumps({"fingerprint": fingerprint, "value": value}, default=str)
+        self.client.set(self.prefix + key, raw, ex=ttl)
+
+    def sweep(self) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+
+_backend = Backend(
+    "idempotency",
+    {"memory": MemoryIdempotencyStore, "redis": redis_factory(RedisIdempotencyStore)},
+    IDEMPOTENCY_BACKEND,
+)
+
+
+def create_store(backend: str = IDEMPOTENCY_BACKEND):
+    return _backend.create(backend)
+
+
+def set_store(store):
+    _backend.set(store)
+
+
+def request_fingerprint(*parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _scoped_key(key: str, user_id: int) -> str:
+    # ключи разных пользователей не пересекаются
+    return f"{user_id}:{key}"
 
-IDEMPOTENCY_TTL = 24 * 3600
 
 # есть ли запись по ключу
-def get_key(key: str) -> Optional[dict]:
-    record = _idemp_storage.get(key)
-    if not record:
-        return None
-# проверка на истечение срока
-    value, expires_at = record
-    if time.time() > expires_at:
-        _idemp_storage.pop(key, None)
+async def get_key(key: str, user_id: int, fingerprint: str) -> Optional[Any]:
+    record = await _backend.call("get", _scoped_key(key, user_id))
+    if record is None:
+        metrics.IDEMPOTENCY_LOOKUPS.inc("miss")
         return None
 
+    stored_fingerprint, value = record
+    if stored_fingerprint != fingerprint:
+        metrics.IDEMPOTENCY_LOOKUPS.inc("conflict")
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request",
+        )
+    metrics.IDEMPOTENCY_LOOKUPS.inc("hit")
     return value
 
 
-def set_key(key: str, value: dict, ttl: int = IDEMPOTENCY_TTL):
-    expires_at = time.time() + ttl
-    _idemp_storage[key] = (value, expires_at)
+async def set_key(key: str, user_id: int, fingerprint: str, value: Any, ttl: int = IDEMPOTENCY_TTL):
+    await _backend.call("set", _scoped_key(key, user_id), fingerprint, value, ttl)
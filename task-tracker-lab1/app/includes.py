@@ -0,0 +1,79 @@
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Type
+
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import Comment, Project, Task
+from app.schemas import CommentRead, ProjectRead
+
+INCLUDE_FIELDS = {"project", "comments"}
+
+# сколько комментариев встраивается в задачу; остальные — через /comments?after=
+COMMENTS_INCLUDE_LIMIT = int(os.getenv("COMMENTS_INCLUDE_LIMIT", "20"))
+COMMENTS_INCLUDE_MAX = int(os.getenv("COMMENTS_INCLUDE_MAX", "100"))
+
+
+def parse_include(include: Optional[str]) -> Set[str]:
+    if not include:
+        return set()
+    parts = {p.strip().lower() for p in include.split(",") if p.strip()}
+    return parts & INCLUDE_FIELDS
+
+
+async def load_comments(session: AsyncSession, task_ids: Iterable[int], limit: int) -> Dict[int, List[Comment]]:
+    # первые limit комментариев каждой задачи одним запросом: IN + row_number()
+    task_ids = list(task_ids)
+    grouped: Dict[int, List[Comment]] = defaultdict(list)
+    if not task_ids or limit <= 0:
+        return grouped
+
+    row_number = (
+        func.row_number()
+        .over(partition_by=Comment.task_id, order_by=Comment.id)
+        .label("row_number")
+    )
+    ranked = (
+        select(Comment.id, row_number)
+        .where(Comment.task_id.in_(task_ids))
+        .subquery()
+    )
+    stmt = (
+        select(Comment)
+        .join(ranked, Comment.id == ranked.c.id)
+        .where(ranked.c.row_number <= limit)
+        .order_by(Comment.task_id, Comment.id)
+    )
+    for comment in await session.exec(stmt):
+        grouped[comment.task_id].append(comment)
+    return grouped
+
+
+async def build_task_payloads(
+    session: AsyncSession,
+    tasks: List[Task],
+    schema: Type[BaseModel],
+    relations_schema: Type[BaseModel],
+    parts: Set[str],
+    comments_limit: int = COMMENTS_INCLUDE_LIMIT,
+    project: Optional[Project] = None,
+) -> List[BaseModel]:
+    comments = {}
+    if "comments" in parts:
+        comments_limit = min(comments_limit, COMMENTS_INCLUDE_MAX)
+        comments = await load_comments(session, [t.id for t in tasks], comments_limit)
+
+    # строка проверяется один раз (schema); связи добавляются готовыми моделями
+    # через model_construct, незапрошенные поля остаются unset
+    payloads = []
+    for task in tasks:
+        data = dict(schema.model_validate(task))
+        if "project" in parts:
+            data["project"] = ProjectRead.model_validate(project or task.project)
+        if "comments" in parts:
+            data["comments"] = [CommentRead.model_validate(c) for c in comments.get(task.id, [])]
+        payloads.append(relations_schema.model_construct(**data))
+    return payloads
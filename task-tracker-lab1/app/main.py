@@ -1,6 +1,10 @@
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
+from sqlalchemy.orm.exc import StaleDataError
 from app.db import init_db
+from app.metrics import MetricsMiddleware
+from app.middleware import RateLimitMiddleware
+from app.profiling import SQL_PROFILE, SqlProfileMiddleware
 from app.routes import (
     v1_auth,
     v1_users,
@@ -8,6 +12,7 @@ from app.routes import (
     v1_tasks,
     v1_comments,
     v2_tasks,
+    v2_search,
     internal_stats,  
 )
 from fastapi.middleware.cors import CORSMiddleware
@@ -25,20 +30,43 @@ def create_app():
     app.include_router(v1_tasks.router)
     app.include_router(v1_comments.router)
     app.include_router(v2_tasks.router)
+    app.include_router(v2_search.router)
 
     app.include_router(internal_stats.router)
 
+    app.add_middleware(RateLimitMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[
+            "Link",
+            "ETag",
+            "Last-Modified",
+            "X-Next-Cursor",
+            "X-Limit-Limit",
+            "X-Limit-Remaining",
+            "Retry-After",
+            "Server-Timing",
+        ],
     )
+    if SQL_PROFILE:
+        app.add_middleware(SqlProfileMiddleware)
+    # последним — значит снаружи: считает и ответы 429 от RateLimitMiddleware
+    app.add_middleware(MetricsMiddleware)
 
     @app.exception_handler(429)
     async def rate_limit_handler(request: Request, exc):
         return JSONResponse(status_code=429, content={"detail": "Too Many Requests"})
 
+    @app.exception_handler(StaleDataError)
+    async def stale_data_handler(request: Request, exc):
+        # строку изменили между чтением и UPDATE (version_id_col)
+        if "if-match" in request.headers:
+            return JSONResponse(status_code=412, content={"detail": "Precondition Failed: resource has changed"})
+        return JSONResponse(status_code=409, content={"detail": "Resource was modified concurrently, retry"})
+
     return app
 
 
@@ -0,0 +1,234 @@
+import bisect
+import contextvars
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+# метрики в памяти процесса, отдаются в текстовом формате Prometheus
+# (GET /api/internal/metrics); при нескольких воркерах Prometheus
+# опрашивает каждый отдельно
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+DB_QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+_registry: List["_Metric"] = []
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [счётчики по корзинам..., count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            record = self._values.get(labels)
+            if record is None:
+                record = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                record[index] += 1
+            record[-2] += 1
+            record[-1] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = [(labels, list(record)) for labels, record in self._values.items()]
+        for labels, record in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, record):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {record[-2]}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_count{label_str} {record[-2]}")
+            lines.append(f"{self.name}_sum{label_str} {_format_value(float(record[-1]))}")
+        return lines
+
+
+class GaugeCallback(_Metric):
+    # значение снимается в момент выдачи метрик
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]], labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        try:
+            samples = list(self.callback())
+        except Exception:
+            return lines
+        for labels, value in samples:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route")
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request.", ("route",), DB_QUERY_BUCKETS
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements per HTTP request.", ("route",)
+)
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL statement latency.")
+RATE_LIMIT_REJECTIONS = Counter("rate_limit_rejections_total", "Requests rejected with 429.")
+IDEMPOTENCY_LOOKUPS = Counter(
+    "idempotency_lookups_total", "Idempotency-Key lookups by result.", ("result",)
+)
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "response_cache_lookups_total", "Response cache lookups by route and result.", ("route", "result")
+)
+RESPONSE_CACHE_INVALIDATIONS = Counter(
+    "response_cache_invalidations_total", "Response cache tags invalidated by writes."
+)
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "bcrypt time per operation, excluding queueing.", ("operation",)
+)
+PASSWORD_HASH_REJECTIONS = Counter(
+    "password_hash_rejections_total", "Password hashing requests rejected with 503."
+)
+
+# текущий запрос: [число запросов к БД, время в БД]
+_request_db: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("request_db", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    DB_QUERY_DURATION.observe(elapsed)
+    stats = _request_db.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _threadpool_samples():
+    from anyio import to_thread
+
+    limiter = to_thread.current_default_thread_limiter()
+    return [(("borrowed",), limiter.borrowed_tokens), (("total",), limiter.total_tokens)]
+
+
+GaugeCallback(
+    "anyio_threadpool_tokens", "Default anyio threadpool (sync endpoints, to_thread) usage.",
+    _threadpool_samples, ("state",),
+)
+
+
+class MetricsMiddleware:
+    # внешний ASGI-слой: латентность и статус каждого запроса, включая 429
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        stats = [0, 0.0]
+        token = _request_db.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db.reset(token)
+
+            # шаблон пути, а не сам путь: число рядов не растёт с числом id
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.inc(scope["method"], route_path, str(status[0]))
+            HTTP_LATENCY.observe(elapsed, scope["method"], route_path)
+            DB_QUERIES_PER_REQUEST.observe(stats[0], route_path)
+            DB_TIME_PER_REQUEST.observe(stats[1], route_path)
@@ -0,0 +1,72 @@
+import json
+from typing import Optional
+
+from app import metrics
+from app.auth import authenticate
+from app.backends import call
+from app.rate_limit import get_limiter
+from app.utils import rate_limit_headers
+
+_TOO_MANY_REQUESTS = json.dumps({"detail": "Too Many Requests"}).encode("utf-8")
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token.strip()
+            return None
+    return None
+
+
+def _client_ip(scope) -> str:
+    # за прокси адрес клиента подставляет uvicorn --proxy-headers
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimitMiddleware:
+    # Проверяет токен и лимит до роутинга, разбора тела и зависимостей FastAPI.
+    # Запросы без валидного access-токена (логин, регистрация, refresh,
+    # битый токен) лимитируются по IP клиента.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _bearer_token(scope)
+        user_id = await authenticate(token) if token else None
+        if user_id is None:
+            identifier = f"ip:{_client_ip(scope)}"
+        else:
+            identifier = f"user:{user_id}"
+            scope.setdefault("state", {})["user_id"] = user_id
+
+        limiter = get_limiter()
+        allowed, remaining, retry_after = await call(limiter, "hit", identifier)
+        headers = rate_limit_headers(limiter.limit, remaining, retry_after)
+
+        if not allowed:
+            metrics.RATE_LIMIT_REJECTIONS.inc()
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(_TOO_MANY_REQUESTS)).encode("latin-1")),
+                    *headers,
+                ],
+            })
+            await send({"type": "http.response.body", "body": _TOO_MANY_REQUESTS})
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), *headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
@@ -1,7 +1,23 @@
+from sqlalchemy import Index
+from sqlalchemy.orm import declared_attr
 from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional, List
 from datetime import datetime
 
+
+class Versioned(SQLModel):
+    # version растёт на каждом UPDATE (version_id_col: UPDATE ... WHERE version = :old),
+    # updated_at выставляется там же; по ним строятся ETag и Last-Modified
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
+    updated_at: datetime = Field(
+        default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow}
+    )
+
+    @declared_attr
+    def __mapper_args__(cls):
+        return {"version_id_col": cls.__table__.c.version}
+
+
 class User(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     email: str = Field(index=True, sa_column_kwargs={"unique": True})
@@ -11,7 +27,10 @@ class User(SQLModel, table=True):
     projects: List["Project"] = Relationship(back_populates="owner")
     tasks_assigned: List["Task"] = Relationship(back_populates="assignee")
 
-class Project(SQLModel, table=True):
+class Project(Versioned, table=True):
+    # (owner_id, id) покрывает и фильтр по owner_id, и пагинацию по id
+    __table_args__ = (Index("ix_project_owner_id_id", "owner_id", "id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
     description: Optional[str] = None
@@ -19,25 +38,63 @@ class Project(SQLModel, table=True):
     owner: Optional[User] = Relationship(back_populates="projects")
     tasks: List["Task"] = Relationship(back_populates="project")
 
-class Task(SQLModel, table=True):
+class Task(Versioned, table=True):
+    # список задач проекта: (project_id, <фильтр или ключ sort>, id) —
+    # равенство по project_id, диапазон/порядок по ключу, id для keyset
+    __table_args__ = (
+        Index("ix_task_project_id_id", "project_id", "id"),
+        Index("ix_task_project_id_status_id", "project_id", "status", "id"),
+        Index("ix_task_project_id_assignee_id_id", "project_id", "assignee_id", "id"),
+        Index("ix_task_project_id_priority_id", "project_id", "priority", "id"),
+        Index("ix_task_project_id_due_date_id", "project_id", "due_date", "id"),
+        Index("ix_task_project_id_created_at_id", "project_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     description: Optional[str] = None
     project_id: Optional[int] = Field(default=None, foreign_key="project.id")
-    assignee_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    assignee_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
     status: str = "open"
     priority: int = 3
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
     due_date: Optional[datetime] = None
     estimated_time_minutes: Optional[int] = None
 
     project: Optional[Project] = Relationship(back_populates="tasks")
     assignee: Optional[User] = Relationship(back_populates="tasks_assigned")
 
-class Comment(SQLModel, table=True):
+class Comment(Versioned, table=True):
+    __table_args__ = (
+        Index("ix_comment_task_id_id", "task_id", "id"),
+        Index("ix_comment_task_id_created_at", "task_id", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     task_id: int = Field(foreign_key="task.id")
     author_id: int = Field(foreign_key="user.id")
     body: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class ProjectSummary(SQLModel, table=True):
+    # агрегаты задач проекта по измерению: status, priority, assignee
+    # (пустая строка — без исполнителя) и due (день срока незакрытых задач);
+    # поддерживаются триггерами на task, см. app.summary
+    __tablename__ = "project_summary"
+
+    project_id: int = Field(primary_key=True)
+    dimension: str = Field(primary_key=True)
+    value: str = Field(primary_key=True)
+    task_count: int = 0
+    estimated_minutes: int = 0
+
+
+class StatsCounter(SQLModel, table=True):
+    # счётчики /api/internal/stats: (total_users|total_projects|total_tasks|
+    # total_comments, '') и (tasks_by_status, статус); поддерживаются
+    # триггерами, см. app.counters
+    __tablename__ = "stats_counter"
+
+    name: str = Field(primary_key=True)
+    key: str = Field(default="", primary_key=True)
+    value: int = 0
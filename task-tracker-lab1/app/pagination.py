@@ -0,0 +1,121 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(values, list) or not values:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def paginate(statement, key_column, limit: int, offset: int, after: Optional[str]):
+    # keyset: WHERE id > last_id вместо OFFSET, цена страницы не зависит от глубины
+    statement = statement.order_by(key_column)
+    if after:
+        last_id = decode_cursor(after)[0]
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return statement.where(key_column > last_id).limit(limit)
+
+    return statement.offset(offset).limit(limit)
+
+
+class SortKey(NamedTuple):
+    # name — значение параметра sort (id, -priority, ...); attr — поле модели
+    name: str
+    attr: str
+    column: Any
+    id_column: Any
+    descending: bool = False
+    nullable: bool = False
+    parse: Callable[[Any], Any] = lambda value: value
+
+
+def parse_datetime(value: Any) -> datetime:
+    if not isinstance(value, str):
+        raise ValueError(value)
+    return datetime.fromisoformat(value)
+
+
+def _after(column, value, descending: bool):
+    return column < value if descending else column > value
+
+
+def _keyset_condition(sort: SortKey, value: Any, last_id: int):
+    # строки после (value, last_id) в порядке ORDER BY column, id; NULL — в конце
+    after_id = _after(sort.id_column, last_id, sort.descending)
+    if value is None:
+        return and_(sort.column.is_(None), after_id)
+
+    condition = or_(
+        _after(sort.column, value, sort.descending),
+        and_(sort.column == value, after_id),
+    )
+    if sort.nullable:
+        condition = or_(condition, sort.column.is_(None))
+    return condition
+
+
+def paginate_sorted(statement, sort: SortKey, limit: int, offset: int, after: Optional[str]):
+    # keyset по (ключ сортировки, id): id различает строки с равным ключом.
+    # Курсор: [sort, значение, id]; курсор другой сортировки отклоняется
+    if sort.column is sort.id_column and not sort.descending:
+        return paginate(statement, sort.id_column, limit, offset, after)
+
+    column = sort.column.desc() if sort.descending else sort.column.asc()
+    if sort.nullable:
+        column = column.nulls_last()
+    order = [column]
+    if sort.column is not sort.id_column:
+        order.append(sort.id_column.desc() if sort.descending else sort.id_column.asc())
+    statement = statement.order_by(*order)
+
+    if not after:
+        return statement.offset(offset).limit(limit)
+
+    values = decode_cursor(after)
+    if len(values) != 3 or values[0] != sort.name or not isinstance(values[2], int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    try:
+        value = None if values[1] is None else sort.parse(values[1])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return statement.where(_keyset_condition(sort, value, values[2])).limit(limit)
+
+
+def _cursor_values(item: Any, sort: Optional[SortKey]) -> List[Any]:
+    if sort is None or (sort.column is sort.id_column and not sort.descending):
+        return [item.id]
+    value = getattr(item, sort.attr)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return [sort.name, value, item.id]
+
+
+def set_next_cursor(
+    request: Request, response: Response, items: Sequence[Any], limit: int, sort: Optional[SortKey] = None
+) -> Optional[str]:
+    if limit <= 0 or len(items) < limit:
+        return None
+
+    cursor = encode_cursor(_cursor_values(items[-1], sort))
+    next_url = request.url.remove_query_params("offset").include_query_params(after=cursor)
+    response.headers["X-Next-Cursor"] = cursor
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return cursor
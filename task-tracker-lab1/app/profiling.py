@@ -0,0 +1,131 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+
+# профилирование SQL по запросам; включается только явно, в проде обычно выключено
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0") == "1"
+# сколько одинаковых SELECT за запрос считать признаком N+1
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "3"))
+
+logger = logging.getLogger("app.sql_profile")
+
+# списки параметров разной длины (IN (?, ?, ?)) дают одну и ту же форму
+_PARAM_LIST = re.compile(r"(\?|\$\d+|%\(\w+\)s)(\s*,\s*(\?|\$\d+|%\(\w+\)s))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    return _PARAM_LIST.sub("?, ...", shape)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.shapes: Counter = Counter()
+        self.shape_seconds: Dict[str, float] = {}
+
+    def record(self, statement: str, elapsed: float):
+        shape = statement_shape(statement)
+        self.queries += 1
+        self.seconds += elapsed
+        self.shapes[shape] += 1
+        self.shape_seconds[shape] = self.shape_seconds.get(shape, 0.0) + elapsed
+
+    def repeated(self) -> List[dict]:
+        return [
+            {"statement": shape, "count": count, "ms": round(self.shape_seconds[shape] * 1000, 3)}
+            for shape, count in self.shapes.most_common()
+            if count > 1
+        ]
+
+    def suspected_n_plus_one(self) -> List[str]:
+        # один и тот же SELECT много раз за запрос — обычно цикл по строкам
+        return [
+            shape
+            for shape, count in self.shapes.items()
+            if count >= SQL_PROFILE_REPEAT_THRESHOLD and shape.upper().startswith("SELECT")
+        ]
+
+    def server_timing(self) -> str:
+        parts = [f'db;dur={self.seconds * 1000:.3f};desc="{self.queries} queries"']
+        for shape in self.suspected_n_plus_one():
+            desc = shape[:80].replace('"', "'")
+            parts.append(f'db-repeat;desc="{self.shapes[shape]}x {desc}"')
+        return ", ".join(parts)
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("sql_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = getattr(context, "_profile_started", None)
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SqlProfileMiddleware:
+    # Server-Timing с числом и временем запросов + строка JSON в лог app.sql_profile.
+    # Заголовок отражает запросы до начала ответа; для потоковых ответов полные
+    # числа — в логе
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", profile.server_timing().encode("latin-1", "replace")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            _log_profile(scope, status[0], profile)
+
+
+def _log_profile(scope, status: int, profile: RequestProfile):
+    suspects = profile.suspected_n_plus_one()
+    route = getattr(scope.get("route"), "path", None)
+    record = {
+        "method": scope["method"],
+        "path": scope["path"],
+        "route": route,
+        "status": status,
+        "queries": profile.queries,
+        "db_ms": round(profile.seconds * 1000, 3),
+        "repeated": profile.repeated(),
+        "n_plus_one": suspects,
+    }
+    logger.log(logging.WARNING if suspects else logging.INFO, json.dumps(record, ensure_ascii=False))
@@ -1,33 +1,134 @@
+import math
 import os
+import threading
 import time
-from typing import Dict, Tuple
+from collections import OrderedDict
+from typing import List, Tuple
 
-_rate_storage: Dict[str, Tuple[int, int]] = {}
+from app.backends import Backend, redis_factory
 
 # колво запросов за окно
 LIMIT = int(os.getenv("RATE_LIMIT", "100"))
 WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
 
 
-def is_allowed(identifier: str):
+def _retry_after(tokens: float, rate: float) -> int:
+    return max(1, math.ceil((1 - tokens) / rate))
 
-    now = int(time.time())
-    window = now // WINDOW
-    key = f"{identifier}:{window}"
 
-    window_id, count = _rate_storage.get(key, (window, 0))
+class MemoryRateLimiter:
+    # token bucket: одна запись (tokens, updated_at) на клиента.
+    # Бакет, простоявший окно, снова полон, поэтому его можно удалить без потерь
+    blocking = False
 
-    if window_id != window:
-        count = 0
-        window_id = window
+    def __init__(self, limit: int = LIMIT, window: int = WINDOW, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.limit = limit
+        self.window = window
+        self.rate = limit / window
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
 
-    count += 1
-    _rate_storage[key] = (window_id, count)
+    def hit(self, identifier: str) -> Tuple[bool, int, int]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(identifier)
+            if bucket is None:
+                tokens = float(self.limit)
+            else:
+                tokens = min(self.limit, bucket[0] + (now - bucket[1]) * self.rate)
 
-    remaining = max(0, LIMIT - count)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
 
-    if count > LIMIT:
-        retry_after = WINDOW - (now % WINDOW)
-        return False, remaining, retry_after
+            self._buckets[identifier] = [tokens, now]
+            self._buckets.move_to_end(identifier)
+            self._evict(now)
 
-    return True, remaining, 0
+        if not allowed:
+            return False, 0, _retry_after(tokens, self.rate)
+        return True, int(tokens), 0
+
+    def _evict(self, now: float):
+        while self._buckets:
+            _, (_, updated_at) = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.max_clients and now - updated_at < self.window:
+                break
+            self._buckets.popitem(last=False)
+
+
+# атомарно на стороне Redis: прочитать бакет, пополнить, списать токен, записать
+_TOKEN_BUCKET_LUA = """
+local limit = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local ttl = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil or ts == nil then
+    tokens = limit
+else
+    tokens = math.min(limit, tokens + math.max(0, now - ts) * rate)
+end
+
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], ttl)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimiter:
+    # общий лимит для всех воркеров; ключ живёт одно окно после последнего запроса
+    blocking = True
+
+    def __init__(self, client, limit: int = LIMIT, window: int = WINDOW, prefix: str = "rl:"):
+        self.limit = limit
+        self.window = window
+        self.rate = limit / window
+        self.prefix = prefix
+        self._script = client.register_script(_TOKEN_BUCKET_LUA)
+
+    def hit(self, identifier: str) -> Tuple[bool, int, int]:
+        allowed, tokens = self._script(
+            keys=[self.prefix + identifier],
+            args=[self.limit, self.rate, self.window],
+        )
+        tokens = float(tokens)
+        if not allowed:
+            return False, 0, _retry_after(tokens, self.rate)
+        return True, int(tokens), 0
+
+
+_backend = Backend(
+    "rate limit",
+    {"memory": MemoryRateLimiter, "redis": redis_factory(RedisRateLimiter)},
+    RATE_LIMIT_BACKEND,
+)
+
+
+def create_limiter(backend: str = RATE_LIMIT_BACKEND):
+    return _backend.create(backend)
+
+
+def get_limiter():
+    return _backend.store
+
+
+def set_limiter(limiter):
+    _backend.set(limiter)
+
+
+def is_allowed(identifier: str) -> Tuple[bool, int, int]:
+    return _backend.store.hit(identifier)
@@ -0,0 +1,19 @@
+import os
+import threading
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis():
+    # общий клиент на процесс; пакет redis импортируется только если он нужен
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import redis
+
+                _client = redis.Redis.from_url(REDIS_URL)
+    return _client
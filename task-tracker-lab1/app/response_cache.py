@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+
+from app import metrics
+from app.backends import Backend, redis_factory
+from app.etags import Validators, is_conditional, is_not_modified, not_modified
+
+# кэш готовых ответов GET (тело + заголовки) по пользователю, пути и
+# параметрам; memory — в процессе, redis — общий для воркеров, off — выключен
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+
+# заголовки ответа, которые сохраняются вместе с телом
+CACHED_HEADERS = ("etag", "last-modified", "x-next-cursor", "link")
+
+
+# Инвалидация через поколения тегов: запись хранит поколения своих тегов на
+# момент чтения из БД (до запроса), запись в БД после commit увеличивает
+# поколение. Запись с устаревшим поколением считается промахом, поэтому
+# ответ, собранный параллельно с изменением, не переживёт инвалидацию
+def task_tag(task_id: int) -> str:
+    # задача и её комментарии
+    return f"task:{task_id}"
+
+
+def project_tag(project_id: int) -> str:
+    return f"project:{project_id}"
+
+
+def project_tasks_tag(project_id: int) -> str:
+    # состав и содержимое задач проекта (списки задач)
+    return f"project-tasks:{project_id}"
+
+
+def owner_tag(user_id: int) -> str:
+    # проекты пользователя: список проектов, доступ к задачам
+    return f"owner:{user_id}"
+
+
+class MemoryResponseCache:
+    blocking = False
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[bytes, Dict[str, str], Tuple[int, ...], float]]" = OrderedDict()
+        # тег -> поколение; вытесненные теги возвращают floor, который не
+        # меньше любого вытесненного поколения, так что старые записи не оживают
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._max_tags = max_entries * 4
+        self._floor = 0
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _generation(self, tag: str) -> int:
+        return self._generations.get(tag, self._floor)
+
+    def get(self, key: str, tags: Sequence[str]):
+        # (запись или None, текущие поколения тегов)
+        with self._lock:
+            generations = tuple(self._generation(tag) for tag in tags)
+            record = self._data.get(key)
+            if not record:
+                return None, generations
+
+            body, headers, stored, expires_at = record
+            if stored != generations or time.time() > expires_at:
+                self._data.pop(key, None)
+                return None, generations
+
+            self._data.move_to_end(key)
+            return (body, headers), generations
+
+    def set(self, key: str, body: bytes, headers: Dict[str, str], generations: Tuple[int, ...], ttl: int):
+        with self._lock:
+            self._data[key] = (body, headers, generations, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def bump(self, tags: Sequence[str]):
+        with self._lock:
+            for tag in tags:
+                self._counter += 1
+                self._generations[tag] = self._counter
+                self._generations.move_to_end(tag)
+            while len(self._generations) > self._max_tags:
+                _, generation = self._generations.popitem(last=False)
+                self._floor = max(self._floor, generation)
+
+
+class RedisResponseCache:
+    # запись и поколения её тегов читаются одним MGET
+    blocking = True
+
+    def __init__(self, client, prefix: str = "respcache:"):
+        self.client = client
+        self.prefix = prefix
+
+    def __len__(self):
+        return 0
+
+    def _generation_key(self, tag: str) -> str:
+        return f"{self.prefix}gen:{tag}"
+
+    def get(self, key: str, tags: Sequence[str]):
+        raw, *values = self.client.mget([self.prefix + key, *(self._generation_key(t) for t in tags)])
+        generations = tuple(int(value or 0) for value in values)
+        if raw is None:
+            return None, generations
+
+        record = json.loads(raw)
+        if tuple(record["generations"]) != generations:
+            return None, generations
+        return (record["body"].encode("utf-8"), record["headers"]), generations
+
+    def set(self, key: str, body: bytes, headers: Dict[str, str], generations: Tuple[int, ...], ttl: int):
+        raw = json.dumps({"body": body.decode("utf-8"), "headers": headers, "generations": generations})
+        self.client.set(self.prefix + key, raw, ex=ttl)
+
+    def bump(self, tags: Sequence[str]):
+        # поколение живёт дольше любой записи, собранной до увеличения
+        pipe = self.client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(self._generation_key(tag))
+            pipe.expire(self._generation_key(tag), RESPONSE_CACHE_TTL + 60)
+        pipe.execute()
+
+
+# store = None, если кэш выключен (off или RESPONSE_CACHE_TTL <= 0)
+_backend = Backend(
+    "response cache",
+    {
+        "memory": MemoryResponseCache,
+        "redis": redis_factory(RedisResponseCache),
+        "off": lambda: None,
+    },
+    RESPONSE_CACHE_BACKEND if RESPONSE_CACHE_TTL > 0 else "off",
+)
+
+
+def create_store(backend: str = RESPONSE_CACHE_BACKEND):
+    return _backend.create(backend if RESPONSE_CACHE_TTL > 0 else "off")
+
+
+def set_store(store):
+    _backend.set(store)
+
+
+def _cache_key(request: Request, user_id: int) -> str:
+    params = sorted(request.query_params.multi_items())
+    raw = json.dumps([user_id, request.url.path, params], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _validators(headers: Dict[str, str]) -> Validators:
+    last_modified = headers.get("last-modified")
+    if last_modified:
+        last_modified = parsedate_to_datetime(last_modified).replace(tzinfo=None)
+    return Validators(headers.get("etag", ""), last_modified or None)
+
+
+class CacheLookup:
+    # response — готовый ответ из кэша (200 или 304) либо None;
+    # при промахе обработчик собирает ответ и передаёт его в store()
+    def __init__(self, key: Optional[str] = None, generations: Tuple[int, ...] = (), response: Optional[Response] = None):
+        self.key = key
+        self.generations = generations
+        self.response = response
+
+    async def store(self, response: Response) -> Response:
+        if self.key is not None and _backend.store is not None and response.status_code == 200:
+            headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+            await _backend.call("set", self.key, response.body, headers, self.generations, RESPONSE_CACHE_TTL)
+        return response
+
+
+async def lookup(request: Request, user_id: int, tags: List[str]) -> CacheLookup:
+    if _backend.store is None:
+        return CacheLookup()
+
+    key = _cache_key(request, user_id)
+    record, generations = await _backend.call("get", key, tags)
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    if record is None:
+        metrics.RESPONSE_CACHE_LOOKUPS.inc(route, "miss")
+        return CacheLookup(key, generations)
+
+    metrics.RESPONSE_CACHE_LOOKUPS.inc(route, "hit")
+    body, headers = record
+    if is_conditional(request) and "etag" in headers:
+        validators = _validators(headers)
+        if is_not_modified(request, validators):
+            return CacheLookup(response=not_modified(validators))
+    return CacheLookup(response=Response(content=body, media_type="application/json", headers=headers))
+
+
+async def invalidate(*tags: str):
+    # вызывается после commit
+    if _backend.store is None or not tags:
+        return
+    metrics.RESPONSE_CACHE_INVALIDATIONS.inc(amount=len(tags))
+    await _backend.call("bump", tags)
+
+
+metrics.GaugeCallback(
+    "response_cache_entries", "Entries in the in-process response cache.",
+    lambda: [((), len(_backend.store) if _backend.store is not None else 0)],
+)
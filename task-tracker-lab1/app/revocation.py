@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from typing import Dict
+
+from app.backends import Backend, redis_factory
+
+REVOCATION_BACKEND = os.getenv("REVOCATION_BACKEND", "memory")
+REVOCATION_MAX_KEYS = int(os.getenv("REVOCATION_MAX_KEYS", "1000000"))
+
+
+class MemoryRevocationStore:
+    # jti -> exp токена; после exp токен и так невалиден, запись можно выбросить
+    blocking = False
+
+    def __init__(self, max_keys: int = REVOCATION_MAX_KEYS):
+        self.max_keys = max_keys
+        self._data: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def is_revoked(self, jti: str) -> bool:
+        with self._lock:
+            return jti in self._data
+
+    def revoke(self, jti: str, exp: float) -> bool:
+        # True, если jti отозван этим вызовом; False — уже был отозван
+        with self._lock:
+            if jti in self._data:
+                return False
+            if len(self._data) >= self.max_keys:
+                self._sweep(time.time())
+            self._data[jti] = exp
+            return True
+
+    def _sweep(self, now: float):
+        expired = [jti for jti, exp in self._data.items() if exp <= now]
+        for jti in expired:
+            del self._data[jti]
+
+
+class RedisRevocationStore:
+    # общий для всех воркеров; запись живёт до exp токена (SET ... NX EXAT).
+    # Отзыв необратим, поэтому найденные jti дополнительно помним локально
+    blocking = True
+
+    def __init__(self, client, prefix: str = "revoked:", max_local: int = REVOCATION_MAX_KEYS):
+        self.client = client
+        self.prefix = prefix
+        self._local = MemoryRevocationStore(max_local)
+
+    def is_revoked(self, jti: str) -> bool:
+        if self._local.is_revoked(jti):
+            return True
+
+        ttl = self.client.pttl(self.prefix + jti)
+        if ttl == -2:
+            return False
+        self._local.revoke(jti, time.time() + max(ttl, 0) / 1000)
+        return True
+
+    def revoke(self, jti: str, exp: float) -> bool:
+        created = self.client.set(self.prefix + jti, 1, nx=True, exat=max(int(exp), int(time.time()) + 1))
+        self._local.revoke(jti, exp)
+        return bool(created)
+
+
+_backend = Backend(
+    "revocation",
+    {"memory": MemoryRevocationStore, "redis": redis_factory(RedisRevocationStore)},
+    REVOCATION_BACKEND,
+)
+
+
+def create_store(backend: str = REVOCATION_BACKEND):
+    return _backend.create(backend)
+
+
+def set_store(store):
+    _backend.set(store)
+
+
+async def is_revoked(jti: str) -> bool:
+    return await _backend.call("is_revoked", jti)
+
+
+async def revoke(jti: str, exp: float) -> bool:
+    return await _backend.call("revoke", jti, exp)
@@ -1,11 +1,11 @@
 import os
 
 from fastapi import APIRouter, Depends, Header, HTTPException
-from sqlmodel import Session, select
-from sqlalchemy import func
+from fastapi.responses import PlainTextResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db import engine
-from app.models import User, Project, Task, Comment
+from app import counters, metrics
+from app.db import get_session, pool_stats
 
 router = APIRouter(prefix="/api/internal", tags=["internal"])
 
@@ -21,18 +21,24 @@ def verify_internal_key(
 
 
 @router.get("/stats")
-def get_internal_stats(
+async def get_internal_stats(
     _ok: bool = Depends(verify_internal_key),
+    session: AsyncSession = Depends(get_session),
 ):
-    with Session(engine) as session:
-        total_users = session.exec(select(func.count(User.id))).one()
-        total_projects = session.exec(select(func.count(Project.id))).one()
-        total_tasks = session.exec(select(func.count(Task.id))).one()
-        total_comments = session.exec(select(func.count(Comment.id))).one()
-
-    return {
-        "total_users": total_users,
-        "total_projects": total_projects,
-        "total_tasks": total_tasks,
-        "total_comments": total_comments,
-    }
+    # готовые счётчики из stats_counter (app.counters), без COUNT по таблицам
+    return await counters.snapshot(session)
+
+
+@router.get("/pool")
+async def get_pool_stats(
+    _ok: bool = Depends(verify_internal_key),
+):
+    return pool_stats()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(
+    _ok: bool = Depends(verify_internal_key),
+):
+    # текстовый формат Prometheus 0.0.4
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,45 +1,113 @@
-from fastapi import APIRouter, HTTPException
-from sqlmodel import Session, select
+from typing import Optional
 
-from app.db import engine
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import get_session
 from app.models import User
-from app.schemas import UserCreate, UserLogin, Token
-from app.auth import get_password_hash, verify_password, create_access_token, create_refresh_token
+from app.schemas import UserCreate, UserLogin, Token, RefreshRequest
+from app.auth import (
+    check_password,
+    create_access_token,
+    create_refresh_token,
+    decode_access_claims,
+    decode_refresh_token,
+    evict_token,
+    hash_password,
+    invalidate_user,
+    needs_rehash,
+)
+from app.revocation import is_revoked, revoke
+from app.serialization import json_response
 
 router = APIRouter(prefix="/api/v1/auth", tags=["auth"])
 
+# access-токен для logout необязателен: без него отзывается только refresh
+optional_bearer = HTTPBearer(auto_error=False)
+
 
 @router.post("/register", response_model=Token)
-def register(payload: UserCreate):
-    with Session(engine) as session:
-        stmt = select(User).where(User.email == payload.email)
-        existing = session.exec(stmt).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="Email already registered")
-
-        user = User(
-            email=payload.email,
-            name=payload.name,
-            password_hash=get_password_hash(payload.password),
-        )
-        session.add(user)
-        session.commit()
-        session.refresh(user)
+async def register(
+    payload: UserCreate,
+    session: AsyncSession = Depends(get_session),
+):
+    stmt = select(User).where(User.email == payload.email)
+    existing = (await session.exec(stmt)).first()
+    if existing:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    user = User(
+        email=payload.email,
+        name=payload.name,
+        password_hash=await hash_password(payload.password),
+    )
+    session.add(user)
+    await session.commit()
 
-        access = create_access_token(str(user.id))
-        refresh = create_refresh_token(str(user.id))
-        return {"access_token": access, "refresh_token": refresh}
+    access = create_access_token(str(user.id))
+    refresh = create_refresh_token(str(user.id))
+    return json_response(Token, {"access_token": access, "refresh_token": refresh})
 
 
 @router.post("/login", response_model=Token)
-def login(payload: UserLogin):
+async def login(
+    payload: UserLogin,
+    session: AsyncSession = Depends(get_session),
+):
    
-    with Session(engine) as session:
-        stmt = select(User).where(User.email == payload.email)
-        user = session.exec(stmt).first()
-        if not user or not verify_password(payload.password, user.password_hash):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-
-        access = create_access_token(str(user.id))
-        refresh = create_refresh_token(str(user.id))
-        return {"access_token": access, "refresh_token": refresh}
+    stmt = select(User).where(User.email == payload.email)
+    user = (await session.exec(stmt)).first()
+    if not user or not await check_password(payload.password, user.password_hash):
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    # BCRYPT_ROUNDS изменился — пароль известен только сейчас, перехэшируем
+    if needs_rehash(user.password_hash):
+        user.password_hash = await hash_password(payload.password)
+        session.add(user)
+        await session.commit()
+        invalidate_user(user.id)
+
+    access = create_access_token(str(user.id))
+    refresh = create_refresh_token(str(user.id))
+    return json_response(Token, {"access_token": access, "refresh_token": refresh})
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(payload: RefreshRequest):
+    # без bcrypt и без БД: подпись токена и проверка jti в списке отозванных
+    credentials_exception = HTTPException(status_code=401, detail="Invalid refresh token")
+
+    claims = decode_refresh_token(payload.refresh_token)
+    if claims is None:
+        raise credentials_exception
+
+    user_id, jti, exp = claims
+    # ротация: старый refresh-токен отзывается; повторное использование — 401
+    if await is_revoked(jti) or not await revoke(jti, exp):
+        raise credentials_exception
+
+    access = create_access_token(str(user_id))
+    refresh_token = create_refresh_token(str(user_id))
+    return json_response(Token, {"access_token": access, "refresh_token": refresh_token})
+
+
+@router.post("/logout", status_code=204)
+async def logout(
+    payload: RefreshRequest,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_bearer),
+):
+    claims = decode_refresh_token(payload.refresh_token)
+    if claims is not None:
+        _, jti, exp = claims
+        await revoke(jti, exp)
+
+    # access-токен из Authorization перестаёт приниматься сразу, а не через exp
+    if credentials is not None:
+        access = decode_access_claims(credentials.credentials)
+        if access is not None and access[1] is not None:
+            _, jti, exp = access
+            await revoke(jti, exp)
+        evict_token(credentials.credentials)
+    return None
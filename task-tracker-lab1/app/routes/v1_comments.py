@@ -1,16 +1,31 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db import engine
-from app.models import Comment, Task, User, Project
+from app.db import get_session
+from app.models import Comment, User
 from app.schemas import CommentCreate, CommentRead
+from app.access import get_owned_task
 from app.auth import get_current_user
-from app.rate_limit import is_allowed
-from app.idempotency import get_key, set_key
+from app.etags import (
+    apply_validators,
+    check_if_match,
+    is_conditional,
+    is_not_modified,
+    not_modified,
+    page_stamp,
+    page_validators,
+    resource_validators,
+)
+from app.idempotency import get_key, set_key, request_fingerprint
+from app.pagination import paginate, set_next_cursor
+from app.serialization import json_response
+from app import response_cache
+from app.response_cache import owner_tag, project_tasks_tag, task_tag
 
 router = APIRouter(
     prefix="/api/v1/tasks/{task_id}/comments",
@@ -18,145 +33,131 @@ router = APIRouter(
 )
 
 
-def apply_rate_limit(user: User):
-    identifier = f"user:{user.id}"
-    allowed, remaining, retry_after = is_allowed(identifier)
-    if not allowed:
-        headers = {
-            "X-Limit-Limit": "100",
-            "X-Limit-Remaining": "0",
-            "Retry-After": str(retry_after),
-        }
-        raise HTTPException(
-            status_code=429,
-            detail="Too Many Requests",
-            headers=headers,
-        )
-
 
 class CommentUpdate(BaseModel):
     body: Optional[str] = None
 
 
-def _get_task_for_user(session: Session, task_id: int, user: User) -> Task:
-    task = session.get(Task, task_id)
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-
-    project = session.get(Project, task.project_id) if task.project_id else None
-    if not project or project.owner_id != user.id:
-        raise HTTPException(status_code=404, detail="Task not found")
-
-    return task
-
-
 @router.post("", response_model=CommentRead, status_code=201)
-def create_comment(
+async def create_comment(
     task_id: int,
     payload: CommentCreate,
     current_user: User = Depends(get_current_user),
     idempotency_key: Optional[str] = Header(
         default=None, alias="Idempotency-Key"
     ),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
     if idempotency_key:
-        cached = get_key(idempotency_key)
+        fingerprint = request_fingerprint(
+            "POST", "/api/v1/tasks/{task_id}/comments", task_id, jsonable_encoder(payload)
+        )
+        cached = await get_key(idempotency_key, current_user.id, fingerprint)
         if cached is not None:
-            return cached
+            return json_response(CommentRead, cached, status_code=201)
 
-    with Session(engine) as session:
-        _ = _get_task_for_user(session, task_id, current_user)
+    task = await get_owned_task(session, task_id, current_user.id)
 
-        comment = Comment(
-            task_id=task_id,
-            author_id=current_user.id,
-            body=payload.body,
-        )
-        session.add(comment)
-        session.commit()
-        session.refresh(comment)
-
-        result = CommentRead.from_orm(comment)
-        data = jsonable_encoder(result)
+    comment = Comment(
+        task_id=task_id,
+        author_id=current_user.id,
+        body=payload.body,
+    )
+    session.add(comment)
+    await session.commit()
+    await response_cache.invalidate(task_tag(task_id), project_tasks_tag(task.project_id))
 
-        if idempotency_key:
-            set_key(idempotency_key, data)
+    result = CommentRead.model_validate(comment)
+    if idempotency_key:
+        await set_key(idempotency_key, current_user.id, fingerprint, result.model_dump(mode="json"))
 
-        return data
+    return json_response(CommentRead, result, status_code=201)
 
 
 @router.get("", response_model=List[CommentRead])
-def list_comments(
+async def list_comments(
     task_id: int,
+    request: Request,
+    response: Response,
     limit: int = 10,
     offset: int = 0,
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
+    cache = await response_cache.lookup(
+        request, current_user.id, [task_tag(task_id), owner_tag(current_user.id)]
+    )
+    if cache.response is not None:
+        return cache.response
 
-    with Session(engine) as session:
-        _ = _get_task_for_user(session, task_id, current_user)
+    await get_owned_task(session, task_id, current_user.id)
 
-        stmt = (
-            select(Comment)
-            .where(Comment.task_id == task_id)
-            .offset(offset)
-            .limit(limit)
-        )
-        items = session.exec(stmt).all()
-        return items
+    stmt = select(Comment).where(Comment.task_id == task_id)
+    stmt = paginate(stmt, Comment.id, limit, offset, after)
+
+    if is_conditional(request):
+        validators = await page_validators(session, await page_stamp(session, stmt, Comment))
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+
+    items = (await session.exec(stmt)).all()
+    set_next_cursor(request, response, items, limit)
+    apply_validators(
+        response, await page_validators(session, [(c.id, c.version) for c in items])
+    )
+    return await cache.store(json_response(CommentRead, items, many=True, response=response))
 
 
 @router.patch("/{comment_id}", response_model=CommentRead)
-def update_comment(
+async def update_comment(
     task_id: int,
     comment_id: int,
     payload: CommentUpdate,
+    response: Response,
     current_user: User = Depends(get_current_user),
+    if_match: Optional[str] = Header(default=None, alias="If-Match"),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
+    task = await get_owned_task(session, task_id, current_user.id)
 
-    with Session(engine) as session:
-        _ = _get_task_for_user(session, task_id, current_user)
+    comment = await session.get(Comment, comment_id)
+    if not comment or comment.task_id != task_id:
+        raise HTTPException(status_code=404, detail="Comment not found")
 
-        comment = session.get(Comment, comment_id)
-        if not comment or comment.task_id != task_id:
-            raise HTTPException(status_code=404, detail="Comment not found")
+    if comment.author_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    check_if_match(if_match, comment.version)
 
-        if comment.author_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Forbidden")
+    data = payload.dict(exclude_unset=True)
+    if "body" in data:
+        comment.body = data["body"]
 
-        data = payload.dict(exclude_unset=True)
-        if "body" in data:
-            comment.body = data["body"]
-
-        session.add(comment)
-        session.commit()
-        session.refresh(comment)
-        return comment
+    session.add(comment)
+    await session.commit()
+    await response_cache.invalidate(task_tag(task_id), project_tasks_tag(task.project_id))
+    apply_validators(response, resource_validators(comment.version, comment.updated_at))
+    return json_response(CommentRead, comment, response=response)
 
 
 @router.delete("/{comment_id}", status_code=204)
-def delete_comment(
+async def delete_comment(
     task_id: int,
     comment_id: int,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
-    with Session(engine) as session:
-        _ = _get_task_for_user(session, task_id, current_user)
+    task = await get_owned_task(session, task_id, current_user.id)
 
-        comment = session.get(Comment, comment_id)
-        if not comment or comment.task_id != task_id:
-            raise HTTPException(status_code=404, detail="Comment not found")
+    comment = await session.get(Comment, comment_id)
+    if not comment or comment.task_id != task_id:
+        raise HTTPException(status_code=404, detail="Comment not found")
 
-        if comment.author_id != current_user.id:
-            raise HTTPException(status_code=403, detail="Forbidden")
+    if comment.author_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
 
-        session.delete(comment)
-        session.commit()
+    await session.delete(comment)
+    await session.commit()
+    await response_cache.invalidate(task_tag(task_id), project_tasks_tag(task.project_id))
 
     return None
@@ -1,35 +1,34 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, Header, Request, Response
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db import engine
+from app.db import get_session
 from app.models import Project, User
 from app.schemas import ProjectCreate, ProjectRead
+from app.access import get_owned_project
 from app.auth import get_current_user
-from app.rate_limit import is_allowed
-from app.idempotency import get_key, set_key
+from app.etags import (
+    apply_validators,
+    check_if_match,
+    is_conditional,
+    is_not_modified,
+    not_modified,
+    project_stamp,
+    resource_validators,
+)
+from app.idempotency import get_key, set_key, request_fingerprint
+from app.pagination import paginate, set_next_cursor
+from app.serialization import json_response
+from app import response_cache
+from app.response_cache import owner_tag, project_tag
 
 router = APIRouter(prefix="/api/v1/projects", tags=["projects"])
 
 
-def apply_rate_limit(user: User):
-    identifier = f"user:{user.id}"
-    allowed, remaining, retry_after = is_allowed(identifier)
-    if not allowed:
-        headers = {
-            "X-Limit-Limit": "100",
-            "X-Limit-Remaining": "0",
-            "Retry-After": str(retry_after),
-        }
-        raise HTTPException(
-            status_code=429,
-            detail="Too Many Requests",
-            headers=headers,
-        )
-
 
 class ProjectUpdate(BaseModel):
     name: Optional[str] = None
@@ -37,108 +36,117 @@ class ProjectUpdate(BaseModel):
 
 
 @router.get("/", response_model=List[ProjectRead])
-def list_projects(
+async def list_projects(
+    request: Request,
+    response: Response,
     limit: int = 10,
     offset: int = 0,
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
-    with Session(engine) as session:
-        stmt = (
-            select(Project)
-            .where(Project.owner_id == current_user.id)
-            .offset(offset)
-            .limit(limit)
-        )
-        projects = session.exec(stmt).all()
-        return projects
+    cache = await response_cache.lookup(request, current_user.id, [owner_tag(current_user.id)])
+    if cache.response is not None:
+        return cache.response
+
+    stmt = select(Project).where(Project.owner_id == current_user.id)
+    stmt = paginate(stmt, Project.id, limit, offset, after)
+    projects = (await session.exec(stmt)).all()
+    set_next_cursor(request, response, projects, limit)
+    return await cache.store(json_response(ProjectRead, projects, many=True, response=response))
 
 
 @router.post("/", response_model=ProjectRead, status_code=201)
-def create_project(
+async def create_project(
     payload: ProjectCreate,
     current_user: User = Depends(get_current_user),
     idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
     if idempotency_key:
-        cached = get_key(idempotency_key)
-        if cached is not None:
-            return cached
-
-    with Session(engine) as session:
-        project = Project(
-            name=payload.name,
-            description=payload.description,
-            owner_id=current_user.id,
+        fingerprint = request_fingerprint(
+            "POST", "/api/v1/projects", jsonable_encoder(payload)
         )
-        session.add(project)
-        session.commit()
-        session.refresh(project)
-
-        result = ProjectRead.from_orm(project)
-        data = jsonable_encoder(result)
-
-        if idempotency_key:
-            set_key(idempotency_key, data)
+        cached = await get_key(idempotency_key, current_user.id, fingerprint)
+        if cached is not None:
+            return json_response(ProjectRead, cached, status_code=201)
+
+    project = Project(
+        name=payload.name,
+        description=payload.description,
+        owner_id=current_user.id,
+    )
+    session.add(project)
+    await session.commit()
+    await response_cache.invalidate(owner_tag(current_user.id))
+
+    result = ProjectRead.model_validate(project)
+    if idempotency_key:
+        await set_key(idempotency_key, current_user.id, fingerprint, result.model_dump(mode="json"))
 
-        return data
+    return json_response(ProjectRead, result, status_code=201)
 
 
 @router.get("/{project_id}", response_model=ProjectRead)
-def get_project(
+async def get_project(
     project_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
+    cache = await response_cache.lookup(request, current_user.id, [project_tag(project_id)])
+    if cache.response is not None:
+        return cache.response
 
-    with Session(engine) as session:
-        project = session.get(Project, project_id)
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Project not found")
-        return project
+    # 304 по версии и updated_at, без загрузки строки
+    if is_conditional(request):
+        stamp = await project_stamp(session, project_id, current_user.id)
+        if stamp is not None:
+            validators = resource_validators(*stamp)
+            if is_not_modified(request, validators):
+                return not_modified(validators)
+
+    project = await get_owned_project(session, project_id, current_user.id)
+    apply_validators(response, resource_validators(project.version, project.updated_at))
+    return await cache.store(json_response(ProjectRead, project, response=response))
 
 
 @router.patch("/{project_id}", response_model=ProjectRead)
-def update_project(
+async def update_project(
     project_id: int,
     payload: ProjectUpdate,
+    response: Response,
     current_user: User = Depends(get_current_user),
+    if_match: Optional[str] = Header(default=None, alias="If-Match"),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
-    with Session(engine) as session:
-        project = session.get(Project, project_id)
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_owned_project(session, project_id, current_user.id)
+    check_if_match(if_match, project.version)
 
-        data = payload.dict(exclude_unset=True)
-        if "name" in data:
-            project.name = data["name"]
-        if "description" in data:
-            project.description = data["description"]
+    data = payload.dict(exclude_unset=True)
+    if "name" in data:
+        project.name = data["name"]
+    if "description" in data:
+        project.description = data["description"]
 
-        session.add(project)
-        session.commit()
-        session.refresh(project)
-        return project
+    session.add(project)
+    await session.commit()
+    await response_cache.invalidate(project_tag(project_id), owner_tag(current_user.id))
+    apply_validators(response, resource_validators(project.version, project.updated_at))
+    return json_response(ProjectRead, project, response=response)
 
 
 @router.delete("/{project_id}", status_code=204)
-def delete_project(
+async def delete_project(
     project_id: int,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
-    with Session(engine) as session:
-        project = session.get(Project, project_id)
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_owned_project(session, project_id, current_user.id)
 
-        session.delete(project)
-        session.commit()
+    await session.delete(project)
+    await session.commit()
+    await response_cache.invalidate(project_tag(project_id), owner_tag(current_user.id))
 
     return None
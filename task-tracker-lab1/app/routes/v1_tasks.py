@@ -1,41 +1,47 @@
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime
 
-from app.db import engine
-from app.models import Task, Project, User, Comment
+from app.db import get_session
+from app.models import Task, User
 from app.schemas import (
     TaskCreate,
     TaskRead,
     TaskReadWithRelations,
-    ProjectRead,
-    CommentRead,
 )
+from app.access import get_owned_project, get_owned_task
 from app.auth import get_current_user
-from app.rate_limit import is_allowed
-from app.idempotency import get_key, set_key
+from app.etags import (
+    apply_validators,
+    check_if_match,
+    is_conditional,
+    is_not_modified,
+    not_modified,
+    page_stamp,
+    page_validators,
+    task_validators,
+)
+from app.includes import (
+    COMMENTS_INCLUDE_LIMIT,
+    COMMENTS_INCLUDE_MAX,
+    build_task_payloads,
+    parse_include,
+)
+from app.idempotency import get_key, set_key, request_fingerprint
+from app.pagination import paginate_sorted, set_next_cursor
+from app.serialization import json_response
+from app.task_filters import filter_tasks, get_task_sort
+from app import response_cache
+from app.response_cache import owner_tag, project_tag, project_tasks_tag, task_tag
 
 router = APIRouter(prefix="/api/v1", tags=["tasks_v1"])
 
 
-def apply_rate_limit(user: User) -> int:
-    identifier = f"user:{user.id}"
-    allowed, remaining, retry_after = is_allowed(identifier)
-    if not allowed:
-        headers = {
-            "X-Limit-Limit": "100",
-            "X-Limit-Remaining": "0",
-            "Retry-After": str(retry_after),
-        }
-        raise HTTPException(
-            status_code=429, detail="Too Many Requests", headers=headers
-        )
-    return remaining
-
 
 class TaskUpdate(BaseModel):
     title: Optional[str] = None
@@ -46,28 +52,62 @@ class TaskUpdate(BaseModel):
     priority: Optional[int] = None
 
 
-@router.get("/projects/{project_id}/tasks", response_model=List[TaskRead])
-def list_tasks(
+@router.get(
+    "/projects/{project_id}/tasks",
+    response_model=List[TaskReadWithRelations],
+    response_model_exclude_unset=True,
+)
+async def list_tasks(
     project_id: int,
+    request: Request,
+    response: Response,
     limit: int = 10,
     offset: int = 0,
+    after: Optional[str] = None,
+    include: Optional[str] = None,
+    comments_limit: int = Query(default=COMMENTS_INCLUDE_LIMIT, ge=0, le=COMMENTS_INCLUDE_MAX),
+    status: Optional[str] = None,
+    priority_gte: Optional[int] = None,
+    assignee_id: Optional[int] = None,
+    due_before: Optional[datetime] = None,
+    sort: str = "id",
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
-    with Session(engine) as session:
-        project = session.get(Project, project_id)
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Project not found")
-
-        statement = (
-            select(Task)
-            .where(Task.project_id == project_id)
-            .offset(offset)
-            .limit(limit)
-        )
-        tasks = session.exec(statement).all()
-        return tasks
+    task_sort = get_task_sort(sort)
+    cache = await response_cache.lookup(
+        request, current_user.id, [project_tag(project_id), project_tasks_tag(project_id)]
+    )
+    if cache.response is not None:
+        return cache.response
+
+    project = await get_owned_project(session, project_id, current_user.id)
+
+    statement = select(Task).where(Task.project_id == project_id)
+    statement = filter_tasks(statement, status, priority_gte, assignee_id, due_before)
+    statement = paginate_sorted(statement, task_sort, limit, offset, after)
+    parts = parse_include(include)
+
+    validators = None
+    if is_conditional(request):
+        rows = await page_stamp(session, statement, Task)
+        validators = await page_validators(session, rows, parts, comments_limit, project)
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+
+    tasks = (await session.exec(statement)).all()
+    set_next_cursor(request, response, tasks, limit, task_sort)
+    if validators is None:
+        rows = [(t.id, t.version) for t in tasks]
+        validators = await page_validators(session, rows, parts, comments_limit, project)
+    apply_validators(response, validators)
+
+    payloads = await build_task_payloads(
+        session, tasks, TaskRead, TaskReadWithRelations, parts, comments_limit, project=project
+    )
+    return await cache.store(
+        json_response(TaskReadWithRelations, payloads, many=True, response=response, exclude_unset=True)
+    )
 
 
 @router.post(
@@ -75,132 +115,117 @@ def list_tasks(
     response_model=TaskRead,
     status_code=201,
 )
-def create_task(
+async def create_task(
     project_id: int,
     payload: TaskCreate,
     current_user: User = Depends(get_current_user),
     idempotency_key: Optional[str] = Header(
         default=None, alias="Idempotency-Key"
         ),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
     if idempotency_key:
-        cached = get_key(idempotency_key)
-        if cached is not None:
-            return cached
-
-    with Session(engine) as session:
-        project = session.get(Project, project_id)
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Project not found")
-
-        task = Task(
-            title=payload.title,
-            description=payload.description,
-            project_id=project_id,
-            assignee_id=payload.assignee_id,
-            due_date=payload.due_date,
+        fingerprint = request_fingerprint(
+            "POST", "/api/v1/projects/{project_id}/tasks", project_id, jsonable_encoder(payload)
         )
+        cached = await get_key(idempotency_key, current_user.id, fingerprint)
+        if cached is not None:
+            return json_response(TaskRead, cached, status_code=201)
+
+    await get_owned_project(session, project_id, current_user.id)
 
-        session.add(task)
-        session.commit()
-        session.refresh(task)
+    task = Task(
+        title=payload.title,
+        description=payload.description,
+        project_id=project_id,
+        assignee_id=payload.assignee_id,
+        due_date=payload.due_date,
+    )
 
-        result = TaskRead.from_orm(task)
-        data = jsonable_encoder(result)
+    session.add(task)
+    await session.commit()
+    await response_cache.invalidate(project_tasks_tag(project_id))
 
-        if idempotency_key:
-            set_key(idempotency_key, data)
+    result = TaskRead.model_validate(task)
+    if idempotency_key:
+        await set_key(idempotency_key, current_user.id, fingerprint, result.model_dump(mode="json"))
 
-        return data
+    return json_response(TaskRead, result, status_code=201)
 
 
 @router.get("/tasks/{task_id}", response_model=TaskReadWithRelations)
-def get_task(
+async def get_task(
     task_id: int,
+    request: Request,
+    response: Response,
     include: Optional[str] = None,
+    comments_limit: int = Query(default=COMMENTS_INCLUDE_LIMIT, ge=0, le=COMMENTS_INCLUDE_MAX),
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
-    with Session(engine) as session:
-        task = session.get(Task, task_id)
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        project = (
-            session.get(Project, task.project_id) if task.project_id else None
+    cache = await response_cache.lookup(
+        request, current_user.id, [task_tag(task_id), owner_tag(current_user.id)]
+    )
+    if cache.response is not None:
+        return cache.response
+
+    parts = parse_include(include)
+
+    # 304 по облегчённому запросу версии, без загрузки задачи и связей
+    validators = None
+    if is_conditional(request):
+        validators = await task_validators(
+            session, parts, comments_limit, task_id=task_id, user_id=current_user.id
         )
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        task_data = TaskRead.from_orm(task).dict()
-        extra = {}
-
-        if include:
-            parts = {p.strip().lower() for p in include.split(",") if p.strip()}
-
-            if "project" in parts and project is not None:
-                extra["project"] = ProjectRead.from_orm(project)
+        if validators is not None and is_not_modified(request, validators):
+            return not_modified(validators)
 
-            if "comments" in parts:
-                stmt = select(Comment).where(Comment.task_id == task_id)
-                comments = session.exec(stmt).all()
-                extra["comments"] = [CommentRead.from_orm(c) for c in comments]
+    task = await get_owned_task(session, task_id, current_user.id)
+    if validators is None:
+        validators = await task_validators(session, parts, comments_limit, task=task)
+    apply_validators(response, validators)
 
-        full = {**task_data, **extra}
-        return full
+    payloads = await build_task_payloads(
+        session, [task], TaskRead, TaskReadWithRelations, parts, comments_limit
+    )
+    return await cache.store(
+        json_response(TaskReadWithRelations, payloads[0], response=response)
+    )
 
 
 @router.patch("/tasks/{task_id}", response_model=TaskRead)
-def update_task(
+async def update_task(
     task_id: int,
     payload: TaskUpdate,
+    response: Response,
     current_user: User = Depends(get_current_user),
+    if_match: Optional[str] = Header(default=None, alias="If-Match"),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
+    task = await get_owned_task(session, task_id, current_user.id)
+    check_if_match(if_match, task.version)
 
-    with Session(engine) as session:
-        task = session.get(Task, task_id)
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
+    update_data = payload.dict(exclude_unset=True)
 
-        project = (
-            session.get(Project, task.project_id) if task.project_id else None
-        )
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        update_data = payload.dict(exclude_unset=True)
-
-        for field, value in update_data.items():
-            setattr(task, field, value)
+    for field, value in update_data.items():
+        setattr(task, field, value)
 
-        session.add(task)
-        session.commit()
-        session.refresh(task)
-        return task
+    session.add(task)
+    await session.commit()
+    await response_cache.invalidate(task_tag(task_id), project_tasks_tag(task.project_id))
+    apply_validators(response, await task_validators(session, set(), 0, task=task))
+    return json_response(TaskRead, task, response=response)
 
 
 @router.delete("/tasks/{task_id}", status_code=204)
-def delete_task(
+async def delete_task(
     task_id: int,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
-    with Session(engine) as session:
-        task = session.get(Task, task_id)
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        project = (
-            session.get(Project, task.project_id) if task.project_id else None
-        )
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_owned_task(session, task_id, current_user.id)
 
-        session.delete(task)
-        session.commit()
-        return None
+    await session.delete(task)
+    await session.commit()
+    await response_cache.invalidate(task_tag(task_id), project_tasks_tag(task.project_id))
+    return None
@@ -1,33 +1,19 @@
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel, EmailStr
 
-from app.db import engine
+from app.db import get_session
 from app.models import User
 from app.schemas import UserRead
-from app.auth import get_current_user, get_password_hash
-from app.rate_limit import is_allowed
+from app.auth import get_current_user, hash_password, invalidate_user
+from app.serialization import json_response
 
 router = APIRouter(prefix="/api/v1/users", tags=["users"])
 
 
-def apply_rate_limit(user: User):
-    identifier = f"user:{user.id}"
-    allowed, remaining, retry_after = is_allowed(identifier)
-    if not allowed:
-        headers = {
-            "X-Limit-Limit": "100",
-            "X-Limit-Remaining": "0",
-            "Retry-After": str(retry_after),
-        }
-        raise HTTPException(
-            status_code=429,
-            detail="Too Many Requests",
-            headers=headers,
-        )
-
 
 class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
@@ -36,81 +22,75 @@ class UserUpdate(BaseModel):
 
 
 @router.get("/me", response_model=UserRead)
-def get_me(current_user: User = Depends(get_current_user)):
-    apply_rate_limit(current_user)
-    return current_user
+async def get_me(current_user: User = Depends(get_current_user)):
+    return json_response(UserRead, current_user)
 
 
 @router.get("/{user_id}", response_model=UserRead)
-def get_user(
+async def get_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
-    with Session(engine) as session:
-        user = session.get(User, user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="Not found")
-        return user
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Not found")
+    return json_response(UserRead, user)
 
 
 @router.patch("/{user_id}", response_model=UserRead)
-def update_user(
+async def update_user(
     user_id: int,
     payload: UserUpdate,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    with Session(engine) as session:
-        user = session.get(User, user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="Not found")
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Not found")
 
-        data = payload.dict(exclude_unset=True)
+    data = payload.dict(exclude_unset=True)
 
-        if "email" in data:
-            existing = session.exec(
-                select(User).where(
-                    User.email == data["email"],
-                    User.id != user_id,
-                )
-            ).first()
-            if existing:
-                raise HTTPException(status_code=400, detail="Email already in use")
-            user.email = data["email"]
+    if "email" in data:
+        existing = (await session.exec(
+            select(User).where(
+                User.email == data["email"],
+                User.id != user_id,
+            )
+        )).first()
+        if existing:
+            raise HTTPException(status_code=400, detail="Email already in use")
+        user.email = data["email"]
 
-        if "name" in data:
-            user.name = data["name"]
+    if "name" in data:
+        user.name = data["name"]
 
-        if "password" in data:
-            user.password_hash = get_password_hash(data["password"])
+    if "password" in data:
+        user.password_hash = await hash_password(data["password"])
 
-        session.add(user)
-        session.commit()
-        session.refresh(user)
-        return user
+    session.add(user)
+    await session.commit()
+    invalidate_user(user_id)
+    return json_response(UserRead, user)
 
 
 @router.delete("/{user_id}", status_code=204)
-def delete_user(
+async def delete_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    apply_rate_limit(current_user)
-
     if current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    with Session(engine) as session:
-        user = session.get(User, user_id)
-        if not user:
-            raise HTTPException(status_code=404, detail="Not found")
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="Not found")
 
-        session.delete(user)
-        session.commit()
+    await session.delete(user)
+    await session.commit()
+    invalidate_user(user_id)
     return None
@@ -0,0 +1,34 @@
+import os
+from typing import List
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.auth import get_current_user
+from app.db import get_session
+from app.schemas import SearchHit
+from app.search import search
+from app.serialization import json_response
+
+router = APIRouter(prefix="/api/v2", tags=["search"])
+
+SEARCH_LIMIT_MAX = int(os.getenv("SEARCH_LIMIT_MAX", "100"))
+
+
+@router.get("/search", response_model=List[SearchHit])
+async def search_tasks(
+    request: Request,
+    response: Response,
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=SEARCH_LIMIT_MAX),
+    offset: int = Query(default=0, ge=0),
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    # задачи и комментарии в проектах пользователя по релевантности;
+    # страницы по offset: порядок задаёт ранг, а не id
+    hits = await search(session, q, current_user.id, limit, offset)
+    if len(hits) == limit:
+        next_url = request.url.include_query_params(offset=offset + limit)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return json_response(SearchHit, hits, many=True, response=response)
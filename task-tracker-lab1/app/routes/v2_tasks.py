@@ -1,26 +1,56 @@
+import os
 from typing import List, Optional
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlmodel import Session, select
+from sqlalchemy import delete, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db import engine
-from app.models import Task, Project, Comment
+from app.db import get_session
+from app.models import Task
 from app.schemas import (
+    ProjectSummaryRead,
+    TaskBatchCreate,
+    TaskBatchResult,
     TaskCreateV2,
     TaskReadV2,
     TaskReadV2WithRelations,
-    ProjectRead,
-    CommentRead,
 )
+from app.access import get_owned_project, get_owned_task
 from app.auth import get_current_user
-from app.idempotency import get_key, set_key
-from app.rate_limit import is_allowed
-from app.utils import set_rate_headers
+from app.etags import (
+    apply_validators,
+    check_if_match,
+    is_conditional,
+    is_not_modified,
+    not_modified,
+    page_stamp,
+    page_validators,
+    task_validators,
+)
+from app.export import EXPORT_FORMATS, EXPORT_MEDIA_TYPES, stream_csv, stream_ndjson
+from app.includes import (
+    COMMENTS_INCLUDE_LIMIT,
+    COMMENTS_INCLUDE_MAX,
+    build_task_payloads,
+    parse_include,
+)
+from app.idempotency import get_key, set_key, request_fingerprint
+from app.pagination import paginate_sorted, set_next_cursor
+from app.serialization import json_response
+from app.summary import get_project_summary
+from app.task_filters import filter_tasks, get_task_sort
+from app import response_cache
+from app.response_cache import owner_tag, project_tag, project_tasks_tag, task_tag
 
 router = APIRouter(prefix="/api/v2", tags=["tasks_v2"])
 
+# максимум элементов в одном batch-запросе
+TASK_BATCH_MAX = int(os.getenv("TASK_BATCH_MAX", "1000"))
+
 
 class TaskUpdateV2(BaseModel):
     title: Optional[str] = None
@@ -32,34 +62,130 @@ class TaskUpdateV2(BaseModel):
     estimated_time_minutes: Optional[int] = None
 
 
-@router.get("/projects/{project_id}/tasks", response_model=List[TaskReadV2])
-def list_tasks(
+class TaskBatchUpdateItem(TaskUpdateV2):
+    id: int
+
+
+class TaskBatchUpdate(BaseModel):
+    tasks: List[TaskBatchUpdateItem]
+
+
+class TaskBatchDelete(BaseModel):
+    ids: List[int]
+
+
+def _check_batch_size(size: int):
+    if size > TASK_BATCH_MAX:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Batch is limited to {TASK_BATCH_MAX} items",
+        )
+
+
+async def _cached_batch(idempotency_key, user_id, method, project_id, payload):
+    # (fingerprint, сохранённый ответ или None)
+    if not idempotency_key:
+        return None, None
+    fingerprint = request_fingerprint(
+        method, "/api/v2/projects/{project_id}/tasks:batch", project_id, payload.model_dump(mode="json")
+    )
+    return fingerprint, await get_key(idempotency_key, user_id, fingerprint)
+
+
+@router.get(
+    "/projects/{project_id}/tasks",
+    response_model=List[TaskReadV2WithRelations],
+    response_model_exclude_unset=True,
+)
+async def list_tasks(
     project_id: int,
+    request: Request,
     response: Response,
     limit: int = 10,
     offset: int = 0,
+    after: Optional[str] = None,
+    include: Optional[str] = None,
+    comments_limit: int = Query(default=COMMENTS_INCLUDE_LIMIT, ge=0, le=COMMENTS_INCLUDE_MAX),
+    status: Optional[str] = None,
+    priority_gte: Optional[int] = None,
+    assignee_id: Optional[int] = None,
+    due_before: Optional[datetime] = None,
+    sort: str = "id",
     current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    identifier = f"user:{current_user.id}"
-    allowed, remaining, retry_after = is_allowed(identifier)
-    set_rate_headers(
-        response,
-        limit=100,
-        remaining=remaining,
-        retry_after=retry_after,
+    task_sort = get_task_sort(sort)
+    cache = await response_cache.lookup(
+        request, current_user.id, [project_tag(project_id), project_tasks_tag(project_id)]
+    )
+    if cache.response is not None:
+        return cache.response
+
+    project = await get_owned_project(session, project_id, current_user.id)
+
+    stmt = select(Task).where(Task.project_id == project_id)
+    stmt = filter_tasks(stmt, status, priority_gte, assignee_id, due_before)
+    stmt = paginate_sorted(stmt, task_sort, limit, offset, after)
+    parts = parse_include(include)
+
+    validators = None
+    if is_conditional(request):
+        rows = await page_stamp(session, stmt, Task)
+        validators = await page_validators(session, rows, parts, comments_limit, project)
+        if is_not_modified(request, validators):
+            return not_modified(validators)
+
+    tasks = (await session.exec(stmt)).all()
+    set_next_cursor(request, response, tasks, limit, task_sort)
+    if validators is None:
+        rows = [(t.id, t.version) for t in tasks]
+        validators = await page_validators(session, rows, parts, comments_limit, project)
+    apply_validators(response, validators)
+
+    payloads = await build_task_payloads(
+        session, tasks, TaskReadV2, TaskReadV2WithRelations, parts, comments_limit, project=project
+    )
+    return await cache.store(
+        json_response(TaskReadV2WithRelations, payloads, many=True, response=response, exclude_unset=True)
     )
-    if not allowed:
-        raise HTTPException(status_code=429, detail="Too Many Requests")
 
-    with Session(engine) as session:
-        stmt = (
-            select(Task)
-            .where(Task.project_id == project_id)
-            .offset(offset)
-            .limit(limit)
-        )
-        tasks = session.exec(stmt).all()
-        return tasks
+
+@router.get("/projects/{project_id}/tasks/export")
+async def export_tasks(
+    project_id: int,
+    format: str = "ndjson",
+    include: Optional[str] = None,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    # все задачи проекта одним ответом, потоком пачками по EXPORT_BATCH_SIZE
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported export format")
+
+    await get_owned_project(session, project_id, current_user.id)
+
+    with_comments = "comments" in parse_include(include)
+    stream = stream_csv if format == "csv" else stream_ndjson
+    return StreamingResponse(
+        stream(project_id, with_comments),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="project-{project_id}-tasks.{format}"'
+        },
+    )
+
+
+@router.get("/projects/{project_id}/summary", response_model=ProjectSummaryRead)
+async def project_summary(
+    project_id: int,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    # готовые агрегаты из project_summary, без прохода по задачам проекта;
+    # не кэшируется: overdue зависит от текущего времени
+    await get_owned_project(session, project_id, current_user.id)
+    summary = await get_project_summary(session, project_id)
+    return json_response(ProjectSummaryRead, summary)
 
 
 @router.post(
@@ -67,149 +193,243 @@ def list_tasks(
     response_model=TaskReadV2,
     status_code=201,
 )
-def create_task(
+async def create_task(
     project_id: int,
     payload: TaskCreateV2,
-    response: Response,
     current_user=Depends(get_current_user),
     idempotency_key: Optional[str] = Header(
         default=None,
         alias="Idempotency-Key",
     ),
+    session: AsyncSession = Depends(get_session),
 ):
-    identifier = f"user:{current_user.id}"
-    allowed, remaining, retry_after = is_allowed(identifier)
-    set_rate_headers(
-        response,
-        limit=100,
-        remaining=remaining,
-        retry_after=retry_after,
+    if idempotency_key:
+        fingerprint = request_fingerprint(
+            "POST", "/api/v2/projects/{project_id}/tasks", project_id, payload.dict()
+        )
+        cached = await get_key(idempotency_key, current_user.id, fingerprint)
+        if cached is not None:
+            return json_response(TaskReadV2, cached, status_code=201)
+
+    await get_owned_project(session, project_id, current_user.id)
+
+    t = Task(
+        title=payload.title,
+        description=payload.description,
+        project_id=project_id,
+        assignee_id=payload.assignee_id,
+        due_date=payload.due_date,
+        estimated_time_minutes=payload.estimated_time_minutes,
     )
-    if not allowed:
-        raise HTTPException(status_code=429, detail="Too Many Requests")
+    session.add(t)
+    await session.commit()
+    await response_cache.invalidate(project_tasks_tag(project_id))
 
+    result = TaskReadV2.model_validate(t)
     if idempotency_key:
-        cached = get_key(idempotency_key)
-        if cached is not None:
-            return cached
-
-    with Session(engine) as session:
-        project = session.get(Project, project_id)
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Project not found")
-
-        t = Task(
-            title=payload.title,
-            description=payload.description,
-            project_id=project_id,
-            assignee_id=payload.assignee_id,
-            due_date=payload.due_date,
-            estimated_time_minutes=payload.estimated_time_minutes,
+        await set_key(idempotency_key, current_user.id, fingerprint, result.model_dump(mode="json"))
+    return json_response(TaskReadV2, result, status_code=201)
+
+
+@router.post(
+    "/projects/{project_id}/tasks:batch",
+    response_model=TaskBatchResult,
+    status_code=201,
+)
+async def create_tasks_batch(
+    project_id: int,
+    payload: TaskBatchCreate,
+    current_user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    session: AsyncSession = Depends(get_session),
+):
+    _check_batch_size(len(payload.tasks))
+    fingerprint, cached = await _cached_batch(
+        idempotency_key, current_user.id, "POST", project_id, payload
+    )
+    if cached is not None:
+        return json_response(TaskBatchResult, cached, status_code=201)
+
+    await get_owned_project(session, project_id, current_user.id)
+
+    # значения по умолчанию (status, created_at, ...) задаёт модель, поэтому
+    # строки собираются через Task(...); вставка — один INSERT ... RETURNING
+    rows = [
+        Task(project_id=project_id, **item.model_dump()).model_dump(exclude={"id"})
+        for item in payload.tasks
+    ]
+    tasks = []
+    if rows:
+        tasks = (await session.scalars(insert(Task).returning(Task), rows)).all()
+    await session.commit()
+    await response_cache.invalidate(project_tasks_tag(project_id))
+
+    result = TaskBatchResult(results=[
+        {"id": t.id, "status": "created", "task": TaskReadV2.model_validate(t)} for t in tasks
+    ])
+    if idempotency_key:
+        await set_key(
+            idempotency_key, current_user.id, fingerprint, result.model_dump(mode="json", exclude_unset=True)
+        )
+    return json_response(TaskBatchResult, result, status_code=201)
+
+
+@router.patch("/projects/{project_id}/tasks:batch", response_model=TaskBatchResult)
+async def update_tasks_batch(
+    project_id: int,
+    payload: TaskBatchUpdate,
+    current_user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    session: AsyncSession = Depends(get_session),
+):
+    _check_batch_size(len(payload.tasks))
+    fingerprint, cached = await _cached_batch(
+        idempotency_key, current_user.id, "PATCH", project_id, payload
+    )
+    if cached is not None:
+        return json_response(TaskBatchResult, cached)
+
+    await get_owned_project(session, project_id, current_user.id)
+
+    # задачи проекта одним SELECT ... IN, изменения — одним commit
+    ids = {item.id for item in payload.tasks}
+    stmt = select(Task).where(Task.project_id == project_id, Task.id.in_(ids))
+    tasks = {t.id: t for t in (await session.exec(stmt)).all()}
+
+    for item in payload.tasks:
+        task = tasks.get(item.id)
+        if task is None:
+            continue
+        for field, value in item.model_dump(exclude_unset=True, exclude={"id"}).items():
+            setattr(task, field, value)
+        session.add(task)
+    await session.commit()
+    await response_cache.invalidate(project_tasks_tag(project_id), *(task_tag(task_id) for task_id in tasks))
+
+    result = TaskBatchResult(results=[
+        {"id": item.id, "status": "updated", "task": TaskReadV2.model_validate(tasks[item.id])}
+        if item.id in tasks
+        else {"id": item.id, "status": "not_found"}
+        for item in payload.tasks
+    ])
+    if idempotency_key:
+        await set_key(
+            idempotency_key, current_user.id, fingerprint, result.model_dump(mode="json", exclude_unset=True)
         )
-        session.add(t)
-        session.commit()
-        session.refresh(t)
+    return json_response(TaskBatchResult, result, exclude_unset=True)
+
+
+@router.delete("/projects/{project_id}/tasks:batch", response_model=TaskBatchResult)
+async def delete_tasks_batch(
+    project_id: int,
+    payload: TaskBatchDelete,
+    current_user=Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+    session: AsyncSession = Depends(get_session),
+):
+    _check_batch_size(len(payload.ids))
+    fingerprint, cached = await _cached_batch(
+        idempotency_key, current_user.id, "DELETE", project_id, payload
+    )
+    if cached is not None:
+        return json_response(TaskBatchResult, cached)
 
-        result = TaskReadV2.from_orm(t).dict()
-        if idempotency_key:
-            set_key(idempotency_key, result)
-        return result
+    await get_owned_project(session, project_id, current_user.id)
+
+    deleted = set()
+    if payload.ids:
+        stmt = (
+            delete(Task)
+            .where(Task.project_id == project_id, Task.id.in_(set(payload.ids)))
+            .returning(Task.id)
+        )
+        deleted = set((await session.scalars(stmt)).all())
+    await session.commit()
+    await response_cache.invalidate(project_tasks_tag(project_id), *(task_tag(task_id) for task_id in deleted))
+
+    result = TaskBatchResult(results=[
+        {"id": task_id, "status": "deleted" if task_id in deleted else "not_found"}
+        for task_id in payload.ids
+    ])
+    if idempotency_key:
+        await set_key(
+            idempotency_key, current_user.id, fingerprint, result.model_dump(mode="json", exclude_unset=True)
+        )
+    return json_response(TaskBatchResult, result, exclude_unset=True)
 
 
 @router.get("/tasks/{task_id}", response_model=TaskReadV2WithRelations)
-def get_task(
+async def get_task(
     task_id: int,
+    request: Request,
+    response: Response,
     include: Optional[str] = None,
+    comments_limit: int = Query(default=COMMENTS_INCLUDE_LIMIT, ge=0, le=COMMENTS_INCLUDE_MAX),
     current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    with Session(engine) as session:
-        t = session.get(Task, task_id)
-        if not t:
-            raise HTTPException(status_code=404, detail="Not found")
-
-        task_data = TaskReadV2.from_orm(t).dict()
-        extra = {}
+    cache = await response_cache.lookup(
+        request, current_user.id, [task_tag(task_id), owner_tag(current_user.id)]
+    )
+    if cache.response is not None:
+        return cache.response
 
-        if include:
-            parts = {p.strip().lower() for p in include.split(",") if p.strip()}
+    parts = parse_include(include)
 
-            if "project" in parts:
-                proj = session.get(Project, t.project_id)
-                if proj:
-                    extra["project"] = ProjectRead.from_orm(proj)
+    validators = None
+    if is_conditional(request):
+        validators = await task_validators(
+            session, parts, comments_limit, task_id=task_id, user_id=current_user.id
+        )
+        if validators is not None and is_not_modified(request, validators):
+            return not_modified(validators)
 
-            if "comments" in parts:
-                stmt = select(Comment).where(Comment.task_id == task_id)
-                comments = session.exec(stmt).all()
-                extra["comments"] = [CommentRead.from_orm(c) for c in comments]
+    t = await get_owned_task(session, task_id, current_user.id)
+    if validators is None:
+        validators = await task_validators(session, parts, comments_limit, task=t)
+    apply_validators(response, validators)
 
-        full = {**task_data, **extra}
-        return full
+    payloads = await build_task_payloads(
+        session, [t], TaskReadV2, TaskReadV2WithRelations, parts, comments_limit
+    )
+    return await cache.store(
+        json_response(TaskReadV2WithRelations, payloads[0], response=response)
+    )
 
 
 @router.patch("/tasks/{task_id}", response_model=TaskReadV2)
-def update_task(
+async def update_task(
     task_id: int,
     payload: TaskUpdateV2,
     response: Response,
     current_user=Depends(get_current_user),
+    if_match: Optional[str] = Header(default=None, alias="If-Match"),
+    session: AsyncSession = Depends(get_session),
 ):
-    identifier = f"user:{current_user.id}"
-    allowed, remaining, retry_after = is_allowed(identifier)
-    set_rate_headers(
-        response,
-        limit=100,
-        remaining=remaining,
-        retry_after=retry_after,
-    )
-    if not allowed:
-        raise HTTPException(status_code=429, detail="Too Many Requests")
-
-    with Session(engine) as session:
-        task = session.get(Task, task_id)
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
-        project = session.get(Project, task.project_id) if task.project_id else None
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        data = payload.dict(exclude_unset=True)
-        for field, value in data.items():
-            setattr(task, field, value)
+    task = await get_owned_task(session, task_id, current_user.id)
+    check_if_match(if_match, task.version)
 
-        session.add(task)
-        session.commit()
-        session.refresh(task)
-        return task
+    data = payload.dict(exclude_unset=True)
+    for field, value in data.items():
+        setattr(task, field, value)
+
+    session.add(task)
+    await session.commit()
+    await response_cache.invalidate(task_tag(task_id), project_tasks_tag(task.project_id))
+    apply_validators(response, await task_validators(session, set(), 0, task=task))
+    return json_response(TaskReadV2, task, response=response)
 
 
 @router.delete("/tasks/{task_id}", status_code=204)
-def delete_task(
+async def delete_task(
     task_id: int,
-    response: Response,
     current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
 ):
-    identifier = f"user:{current_user.id}"
-    allowed, remaining, retry_after = is_allowed(identifier)
-    set_rate_headers(
-        response,
-        limit=100,
-        remaining=remaining,
-        retry_after=retry_after,
-    )
-    if not allowed:
-        raise HTTPException(status_code=429, detail="Too Many Requests")
-
-    with Session(engine) as session:
-        task = session.get(Task, task_id)
-        if not task:
-            raise HTTPException(status_code=404, detail="Task not found")
-
-        project = session.get(Project, task.project_id) if task.project_id else None
-        if not project or project.owner_id != current_user.id:
-            raise HTTPException(status_code=404, detail="Task not found")
+    task = await get_owned_task(session, task_id, current_user.id)
 
-        session.delete(task)
-        session.commit()
+    await session.delete(task)
+    await session.commit()
+    await response_cache.invalidate(task_tag(task_id), project_tasks_tag(task.project_id))
 
     return None
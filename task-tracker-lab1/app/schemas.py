@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -26,6 +26,10 @@ class Token(BaseModel):
     refresh_token: Optional[str] = None
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 class ProjectCreate(BaseModel):
     name: str
     description: Optional[str] = None
@@ -93,3 +97,44 @@ class TaskReadWithRelations(TaskRead):
 class TaskReadV2WithRelations(TaskReadV2):
     project: Optional[ProjectRead] = None
     comments: Optional[List[CommentRead]] = None
+
+
+class TaskBatchCreate(BaseModel):
+    tasks: List[TaskCreateV2]
+
+
+class TaskBatchItemResult(BaseModel):
+    id: Optional[int] = None
+    status: str
+    task: Optional[TaskReadV2] = None
+
+
+class TaskBatchResult(BaseModel):
+    results: List[TaskBatchItemResult]
+
+
+class SearchHit(BaseModel):
+    type: str
+    id: int
+    task_id: int
+    project_id: int
+    title: str
+    body: Optional[str] = None
+    rank: float
+
+
+class SummaryBucket(BaseModel):
+    tasks: int
+    estimated_minutes: int
+
+
+class ProjectSummaryRead(BaseModel):
+    project_id: int
+    total_tasks: int
+    estimated_minutes: int
+    # ключи: статус, приоритет, id исполнителя ("unassigned" — без исполнителя)
+    by_status: Dict[str, SummaryBucket]
+    by_priority: Dict[str, SummaryBucket]
+    by_assignee: Dict[str, SummaryBucket]
+    # незакрытые задачи с прошедшим сроком
+    overdue: int
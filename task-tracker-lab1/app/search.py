@@ -0,0 +1,196 @@
+import re
+from typing import List
+
+from sqlalchemy import DDL, Index, String, cast, event, func, literal_column, null, select, text, union_all
+from sqlalchemy.sql import column, table
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db import IS_SQLITE
+from app.models import Comment, Project, Task
+
+# Полнотекстовый поиск по задачам (title, description) и комментариям (body).
+# Индекс поддерживает сама БД, поэтому он синхронен с любыми записями,
+# включая batch INSERT/DELETE мимо ORM:
+# - SQLite: FTS5-таблицы с внешним содержимым + триггеры на task и comment;
+# - PostgreSQL: GIN-индексы по выражению to_tsvector, запрос использует то же выражение.
+
+# 'simple' — без стемминга и стоп-слов: одинаково для русского и английского
+TS_CONFIG = "simple"
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+SQLITE_DDL = {
+    "task": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+        "title, description, content='task', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN "
+        "INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN "
+        "INSERT INTO task_fts(task_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description ON task BEGIN "
+        "INSERT INTO task_fts(task_fts, rowid, title, description) "
+        "VALUES ('delete', old.id, old.title, old.description); "
+        "INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+        "END",
+    ],
+    "comment": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5("
+        "body, content='comment', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS comment_fts_ai AFTER INSERT ON comment BEGIN "
+        "INSERT INTO comment_fts(rowid, body) VALUES (new.id, new.body); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS comment_fts_ad AFTER DELETE ON comment BEGIN "
+        "INSERT INTO comment_fts(comment_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+        "END",
+        "CREATE TRIGGER IF NOT EXISTS comment_fts_au AFTER UPDATE OF body ON comment BEGIN "
+        "INSERT INTO comment_fts(comment_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+        "INSERT INTO comment_fts(rowid, body) VALUES (new.id, new.body); "
+        "END",
+    ],
+}
+
+# новая база (init_db): FTS5 и триггеры создаются вместе с таблицами;
+# существующую базу переводит миграция 0003
+for _model in (Task, Comment):
+    for _statement in SQLITE_DDL[_model.__tablename__]:
+        event.listen(_model.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+# столбцы таблиц, а не атрибуты ORM: так Index привязывается к таблице
+_task = Task.__table__
+_comment = Comment.__table__
+
+
+def _const(value: str):
+    # константы выражения пишутся в SQL как есть, а не параметрами: иначе
+    # PostgreSQL не сопоставит выражение запроса с выражением индекса
+    return text(f"'{value}'")
+
+
+def task_vector():
+    # заголовок весит больше описания (ts_rank учитывает веса A > B)
+    return func.setweight(
+        func.to_tsvector(_const(TS_CONFIG), func.coalesce(_task.c.title, _const(""))), _const("A")
+    ).op("||")(
+        func.setweight(
+            func.to_tsvector(_const(TS_CONFIG), func.coalesce(_task.c.description, _const(""))), _const("B")
+        )
+    )
+
+
+def comment_vector():
+    return func.to_tsvector(_const(TS_CONFIG), _comment.c.body)
+
+
+POSTGRES_INDEXES = [
+    Index("ix_task_search", task_vector(), postgresql_using="gin").ddl_if(dialect="postgresql"),
+    Index("ix_comment_search", comment_vector(), postgresql_using="gin").ddl_if(dialect="postgresql"),
+]
+
+
+def parse_terms(q: str) -> List[str]:
+    # только буквы и цифры: синтаксис MATCH / tsquery из ввода не попадает в запрос
+    return [term.lower() for term in _TERM.findall(q)]
+
+
+def _fts5_query(terms: List[str]) -> str:
+    # все слова, каждое как префикс: "отч"* "квар"*
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _tsquery(terms: List[str]) -> str:
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def _sqlite_hits(terms: List[str], user_id: int):
+    match = _fts5_query(terms)
+    task_fts = table("task_fts", column("rowid"))
+    comment_fts = table("comment_fts", column("rowid"))
+
+    # bm25 тем меньше, чем лучше совпадение; title весит вдвое больше description
+    tasks = (
+        select(
+            literal_column("'task'").label("type"),
+            Task.id.label("id"),
+            Task.id.label("task_id"),
+            Task.project_id.label("project_id"),
+            Task.title.label("title"),
+            cast(null(), String).label("body"),
+            (-func.bm25(literal_column("task_fts"), 2.0, 1.0)).label("rank"),
+        )
+        .select_from(task_fts)
+        .join(Task, Task.id == task_fts.c.rowid)
+        .join(Project, Project.id == Task.project_id)
+        .where(literal_column("task_fts").op("MATCH")(match), Project.owner_id == user_id)
+    )
+    comments = (
+        select(
+            literal_column("'comment'").label("type"),
+            Comment.id.label("id"),
+            Comment.task_id.label("task_id"),
+            Task.project_id.label("project_id"),
+            Task.title.label("title"),
+            Comment.body.label("body"),
+            (-func.bm25(literal_column("comment_fts"))).label("rank"),
+        )
+        .select_from(comment_fts)
+        .join(Comment, Comment.id == comment_fts.c.rowid)
+        .join(Task, Task.id == Comment.task_id)
+        .join(Project, Project.id == Task.project_id)
+        .where(literal_column("comment_fts").op("MATCH")(match), Project.owner_id == user_id)
+    )
+    return tasks, comments
+
+
+def _postgres_hits(terms: List[str], user_id: int):
+    query = func.to_tsquery(_const(TS_CONFIG), _tsquery(terms))
+    tasks = (
+        select(
+            literal_column("'task'").label("type"),
+            Task.id.label("id"),
+            Task.id.label("task_id"),
+            Task.project_id.label("project_id"),
+            Task.title.label("title"),
+            cast(null(), String).label("body"),
+            func.ts_rank(task_vector(), query).label("rank"),
+        )
+        .join(Project, Project.id == Task.project_id)
+        .where(task_vector().op("@@")(query), Project.owner_id == user_id)
+    )
+    comments = (
+        select(
+            literal_column("'comment'").label("type"),
+            Comment.id.label("id"),
+            Comment.task_id.label("task_id"),
+            Task.project_id.label("project_id"),
+            Task.title.label("title"),
+            Comment.body.label("body"),
+            func.ts_rank(comment_vector(), query).label("rank"),
+        )
+        .join(Task, Task.id == Comment.task_id)
+        .join(Project, Project.id == Task.project_id)
+        .where(comment_vector().op("@@")(query), Project.owner_id == user_id)
+    )
+    return tasks, comments
+
+
+async def search(session: AsyncSession, q: str, user_id: int, limit: int, offset: int) -> List[dict]:
+    # задачи и комментарии в проектах пользователя, по убыванию релевантности
+    terms = parse_terms(q)
+    if not terms:
+        return []
+
+    tasks, comments = (_sqlite_hits if IS_SQLITE else _postgres_hits)(terms, user_id)
+    hits = union_all(tasks, comments).subquery()
+    stmt = (
+        select(hits)
+        .order_by(hits.c.rank.desc(), hits.c.type.desc(), hits.c.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    return [dict(row) for row in (await session.execute(stmt)).mappings().all()]
@@ -0,0 +1,42 @@
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+# TypeAdapter строит валидатор и сериализатор один раз на схему
+_adapters: Dict[Tuple[Type[BaseModel], bool], TypeAdapter] = {}
+
+
+def _get_adapter(schema: Type[BaseModel], many: bool) -> TypeAdapter:
+    adapter = _adapters.get((schema, many))
+    if adapter is None:
+        adapter = TypeAdapter(List[schema] if many else schema)
+        _adapters[(schema, many)] = adapter
+    return adapter
+
+
+def dump_json(schema: Type[BaseModel], obj: Any, many: bool = False, exclude_unset: bool = False) -> bytes:
+    # ORM-объект, dict или готовая модель -> JSON за один проход;
+    # экземпляры schema повторно не валидируются
+    adapter = _get_adapter(schema, many)
+    value = adapter.validate_python(obj, from_attributes=True)
+    return adapter.dump_json(value, exclude_unset=exclude_unset)
+
+
+def json_response(
+    schema: Type[BaseModel],
+    obj: Any,
+    many: bool = False,
+    status_code: int = 200,
+    response: Optional[Response] = None,
+    exclude_unset: bool = False,
+) -> Response:
+    # возвращённый Response FastAPI отдаёт как есть, без повторной проверки
+    # по response_model; заголовки из параметра response переносим сами
+    headers = dict(response.headers) if response is not None else None
+    return Response(
+        content=dump_json(schema, obj, many=many, exclude_unset=exclude_unset),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
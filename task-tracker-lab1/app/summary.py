@@ -0,0 +1,160 @@
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import DDL, event, func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models import ProjectSummary, Task
+
+# Сводка по проекту читается из project_summary (десятки строк на проект),
+# а не агрегатом по task. Таблицу обновляют триггеры на task в той же
+# транзакции, что и запись, поэтому учитываются и batch INSERT/DELETE мимо ORM.
+# Просрочка зависит от текущего времени, поэтому хранится по дням срока:
+# прошедшие дни суммируются из сводки, сегодняшний считается по индексу.
+
+# статус закрытой задачи: такие задачи не бывают просроченными
+DONE_STATUS = "done"
+
+_UPSERT = (
+    "INSERT INTO project_summary (project_id, dimension, value, task_count, estimated_minutes) "
+    "SELECT * FROM ({rows}) AS delta WHERE project_id IS NOT NULL "
+    "ON CONFLICT (project_id, dimension, value) DO UPDATE SET "
+    "task_count = project_summary.task_count + excluded.task_count, "
+    "estimated_minutes = project_summary.estimated_minutes + excluded.estimated_minutes"
+)
+
+
+def _delta_rows(row: str, sign: str, day: str) -> str:
+    # вклад одной задачи (row — new/old или параметры функции) со знаком sign
+    minutes = f"{sign} * coalesce({row}estimated_time_minutes, 0)"
+    return " UNION ALL ".join([
+        f"SELECT {row}project_id AS project_id, 'status' AS dimension, {row}status AS value, "
+        f"{sign} AS task_count, {minutes} AS estimated_minutes",
+        f"SELECT {row}project_id, 'priority', CAST({row}priority AS TEXT), {sign}, {minutes}",
+        f"SELECT {row}project_id, 'assignee', coalesce(CAST({row}assignee_id AS TEXT), ''), {sign}, {minutes}",
+        f"SELECT {row}project_id, 'due', {day}, {sign}, {minutes} "
+        f"WHERE {row}due_date IS NOT NULL AND {row}status <> '{DONE_STATUS}'",
+    ])
+
+
+def _cleanup(row: str) -> str:
+    return f"DELETE FROM project_summary WHERE project_id = {row}project_id AND task_count = 0"
+
+
+def _sqlite_apply(row: str, sign: str) -> str:
+    prefix = f"{row}."
+    return (
+        _UPSERT.format(rows=_delta_rows(prefix, sign, f"date({prefix}due_date)")) + "; "
+        + _cleanup(prefix) + "; "
+    )
+
+
+# столбцы, от которых зависит сводка
+_COLUMNS = "project_id, status, priority, assignee_id, estimated_time_minutes, due_date"
+
+SQLITE_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS task_summary_ai AFTER INSERT ON task BEGIN "
+    + _sqlite_apply("new", "1") + "END",
+    "CREATE TRIGGER IF NOT EXISTS task_summary_ad AFTER DELETE ON task BEGIN "
+    + _sqlite_apply("old", "-1") + "END",
+    f"CREATE TRIGGER IF NOT EXISTS task_summary_au AFTER UPDATE OF {_COLUMNS} ON task BEGIN "
+    + _sqlite_apply("old", "-1") + _sqlite_apply("new", "1") + "END",
+]
+
+POSTGRES_DDL = [
+    "CREATE OR REPLACE FUNCTION project_summary_apply("
+    "p_project_id integer, p_status varchar, p_priority integer, p_assignee_id integer, "
+    "p_estimated_time_minutes integer, p_due_date timestamp, p_sign integer) RETURNS void AS $$ "
+    "BEGIN "
+    + _UPSERT.format(rows=_delta_rows("p_", "p_sign", "to_char(p_due_date, 'YYYY-MM-DD')")) + "; "
+    + _cleanup("p_") + "; "
+    "END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE FUNCTION task_summary_trigger() RETURNS trigger AS $$ "
+    "BEGIN "
+    "IF TG_OP IN ('UPDATE', 'DELETE') THEN "
+    "PERFORM project_summary_apply(OLD.project_id, OLD.status, OLD.priority, OLD.assignee_id, "
+    "OLD.estimated_time_minutes, OLD.due_date, -1); "
+    "END IF; "
+    "IF TG_OP IN ('INSERT', 'UPDATE') THEN "
+    "PERFORM project_summary_apply(NEW.project_id, NEW.status, NEW.priority, NEW.assignee_id, "
+    "NEW.estimated_time_minutes, NEW.due_date, 1); "
+    "END IF; "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql",
+    "DROP TRIGGER IF EXISTS task_summary ON task",
+    f"CREATE TRIGGER task_summary AFTER INSERT OR DELETE OR UPDATE OF {_COLUMNS} ON task "
+    "FOR EACH ROW EXECUTE FUNCTION task_summary_trigger()",
+]
+
+def _backfill(day: str) -> str:
+    # начальное заполнение из существующих задач (таблица создана на непустой базе)
+    minutes = "coalesce(sum(estimated_time_minutes), 0)"
+    return (
+        "INSERT INTO project_summary (project_id, dimension, value, task_count, estimated_minutes) "
+        f"SELECT project_id, 'status', status, count(*), {minutes} FROM task "
+        "WHERE project_id IS NOT NULL GROUP BY project_id, status "
+        f"UNION ALL SELECT project_id, 'priority', CAST(priority AS TEXT), count(*), {minutes} FROM task "
+        "WHERE project_id IS NOT NULL GROUP BY project_id, priority "
+        f"UNION ALL SELECT project_id, 'assignee', coalesce(CAST(assignee_id AS TEXT), ''), count(*), {minutes} "
+        "FROM task WHERE project_id IS NOT NULL GROUP BY project_id, assignee_id "
+        f"UNION ALL SELECT project_id, 'due', {day}, count(*), {minutes} FROM task "
+        f"WHERE project_id IS NOT NULL AND due_date IS NOT NULL AND status <> '{DONE_STATUS}' "
+        f"GROUP BY project_id, {day}"
+    )
+
+
+SQLITE_BACKFILL = _backfill("date(due_date)")
+POSTGRES_BACKFILL = _backfill("to_char(due_date, 'YYYY-MM-DD')")
+
+# новая база (init_db): триггеры создаются вместе с project_summary, после
+# task; существующую базу переводит миграция 0005
+ProjectSummary.__table__.add_is_dependent_on(Task.__table__)
+for _statement in SQLITE_DDL + [SQLITE_BACKFILL]:
+    event.listen(ProjectSummary.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in POSTGRES_DDL + [POSTGRES_BACKFILL]:
+    event.listen(ProjectSummary.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+
+def _bucket(rows: Dict[str, int], key: str, tasks: int, minutes: int):
+    rows[key] = {"tasks": tasks, "estimated_minutes": minutes}
+
+
+async def get_project_summary(session: AsyncSession, project_id: int, now: datetime = None) -> Dict:
+    now = now or datetime.utcnow()
+    today = now.strftime("%Y-%m-%d")
+    stmt = select(
+        ProjectSummary.dimension, ProjectSummary.value, ProjectSummary.task_count, ProjectSummary.estimated_minutes
+    ).where(ProjectSummary.project_id == project_id, ProjectSummary.task_count > 0)
+
+    summary = {
+        "project_id": project_id,
+        "total_tasks": 0,
+        "estimated_minutes": 0,
+        "by_status": {},
+        "by_priority": {},
+        "by_assignee": {},
+        "overdue": 0,
+    }
+    for dimension, value, tasks, minutes in (await session.execute(stmt)).all():
+        if dimension == "status":
+            summary["total_tasks"] += tasks
+            summary["estimated_minutes"] += minutes
+            _bucket(summary["by_status"], value, tasks, minutes)
+        elif dimension == "priority":
+            _bucket(summary["by_priority"], value, tasks, minutes)
+        elif dimension == "assignee":
+            _bucket(summary["by_assignee"], value or "unassigned", tasks, minutes)
+        elif dimension == "due" and value < today:
+            summary["overdue"] += tasks
+
+    # сегодняшние сроки, уже прошедшие: диапазон по ix_task_project_id_due_date_id
+    start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    due_today = select(func.count()).select_from(Task).where(
+        Task.project_id == project_id,
+        Task.due_date >= start_of_day,
+        Task.due_date < now,
+        Task.status != DONE_STATUS,
+    )
+    summary["overdue"] += (await session.execute(due_today)).scalar_one()
+    return summary
@@ -0,0 +1,63 @@
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from fastapi import HTTPException
+
+from app.models import Task
+from app.pagination import SortKey, parse_datetime
+
+
+def _parse_int(value: Any) -> int:
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(value)
+    return value
+
+
+# допустимые ключи sort= (с "-" — по убыванию); под каждый есть индекс
+# (project_id, <ключ>, id), см. app.models.Task
+_SORT_FIELDS = {
+    "id": (False, _parse_int),
+    "created_at": (False, parse_datetime),
+    "priority": (False, _parse_int),
+    "due_date": (True, parse_datetime),
+}
+
+TASK_SORTS = {
+    f"-{attr}" if descending else attr: SortKey(
+        f"-{attr}" if descending else attr, attr, getattr(Task, attr), Task.id, descending, nullable, parse
+    )
+    for attr, (nullable, parse) in _SORT_FIELDS.items()
+    for descending in (False, True)
+}
+
+
+def get_task_sort(sort: str) -> SortKey:
+    key = TASK_SORTS.get(sort)
+    if key is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported sort, expected one of: {', '.join(TASK_SORTS)}",
+        )
+    return key
+
+
+def filter_tasks(
+    statement,
+    status: Optional[str] = None,
+    priority_gte: Optional[int] = None,
+    assignee_id: Optional[int] = None,
+    due_before: Optional[datetime] = None,
+):
+    # status=open,in_progress — любой из перечисленных
+    if status:
+        statement = statement.where(Task.status.in_([s for s in status.split(",") if s]))
+    if priority_gte is not None:
+        statement = statement.where(Task.priority >= priority_gte)
+    if assignee_id is not None:
+        statement = statement.where(Task.assignee_id == assignee_id)
+    if due_before is not None:
+        # даты хранятся в UTC без tzinfo
+        if due_before.tzinfo is not None:
+            due_before = due_before.astimezone(timezone.utc).replace(tzinfo=None)
+        statement = statement.where(Task.due_date < due_before)
+    return statement
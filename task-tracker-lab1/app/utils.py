@@ -1,7 +1,11 @@
-from fastapi import Response
+from typing import List, Tuple
 
-def set_rate_headers(response: Response, limit: int, remaining: int, retry_after: int = 0):
-    response.headers["X-Limit-Limit"] = str(limit)
-    response.headers["X-Limit-Remaining"] = str(remaining)
+
+def rate_limit_headers(limit: int, remaining: int, retry_after: int = 0) -> List[Tuple[bytes, bytes]]:
+    headers = [
+        (b"x-limit-limit", str(limit).encode("latin-1")),
+        (b"x-limit-remaining", str(remaining).encode("latin-1")),
+    ]
     if retry_after:
-        response.headers["Retry-After"] = str(retry_after)
+        headers.append((b"retry-after", str(retry_after).encode("latin-1")))
+    return headers
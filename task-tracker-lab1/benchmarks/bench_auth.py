@@ -0,0 +1,104 @@
+"""Стоимость аутентификации на запрос.
+
+Запуск из корня проекта:
+
+    python -m benchmarks.bench_auth [--iterations N]
+
+Печатает JSON: время decode_access_claims без кэша и с кэшем, для
+каждого доступного JWT-бэкенда, и латентность GET /api/v1/users/me
+через ASGI с кэшем токенов и без него.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+_tmp_dir = tempfile.mkdtemp(prefix="bench_auth_")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp_dir}/bench.db")
+os.environ.setdefault("RATE_LIMIT", "100000000")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app import auth  # noqa: E402
+
+
+def _per_call_us(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+def bench_decode(iterations: int) -> dict:
+    results = {}
+    for backend in ("jose", "pyjwt"):
+        try:
+            encode, decode, error = auth._load_jwt_backend(backend)
+        except ImportError:
+            continue
+
+        auth._jwt_encode, auth._jwt_decode, auth.JWTError = encode, decode, error
+        token = auth.create_access_token("1")
+
+        def cold():
+            auth._token_cache.clear()
+            auth.decode_access_claims(token)
+
+        auth._token_cache.clear()
+        results[backend] = {
+            "decode_uncached_us": round(_per_call_us(cold, iterations), 2),
+            "decode_cached_us": round(_per_call_us(lambda: auth.decode_access_claims(token), iterations), 2),
+        }
+
+    auth._jwt_encode, auth._jwt_decode, auth.JWTError = auth._load_jwt_backend(auth.JWT_BACKEND)
+    return results
+
+
+async def bench_request(iterations: int) -> dict:
+    import httpx
+
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        resp = await client.post(
+            "/api/v1/auth/register",
+            json={"email": "bench@example.com", "password": "bench-password"},
+        )
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        results = {}
+        cache_size = auth.TOKEN_CACHE_SIZE
+        for label, size in (("token_cache_off", 0), ("token_cache_on", cache_size or 10000)):
+            auth.TOKEN_CACHE_SIZE = size
+            auth._token_cache.clear()
+            await client.get("/api/v1/users/me", headers=headers)
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                await client.get("/api/v1/users/me", headers=headers)
+            elapsed = time.perf_counter() - started
+            results[label] = {"users_me_mean_us": round(elapsed / iterations * 1_000_000, 2)}
+
+        auth.TOKEN_CACHE_SIZE = cache_size
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    report = {
+        "jwt_backend": auth.JWT_BACKEND,
+        "decode": bench_decode(args.iterations),
+        "request": asyncio.run(bench_request(max(1, args.iterations // 10))),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
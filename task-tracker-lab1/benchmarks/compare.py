@@ -0,0 +1,66 @@
+"""Сравнение двух результатов benchmarks.run.
+
+    python -m benchmarks.compare base.json new.json [--threshold 10]
+
+Печатает изменение p50/p95/p99 и throughput по сценариям. Код выхода 1,
+если p95 какого-либо сценария вырос больше чем на --threshold процентов
+или в новом прогоне появились ошибки.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps")
+
+
+def _change(old: float, new: float) -> float:
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def compare(base: dict, new: dict, threshold: float):
+    lines = []
+    regressions = []
+    for name, new_result in new["results"].items():
+        old_result = base["results"].get(name)
+        if old_result is None:
+            lines.append(f"{name}: no baseline")
+            continue
+
+        parts = []
+        for metric in METRICS:
+            old_value, new_value = old_result[metric], new_result[metric]
+            parts.append(f"{metric} {old_value} -> {new_value} ({_change(old_value, new_value):+.1f}%)")
+        lines.append(f"{name}: " + ", ".join(parts))
+
+        if _change(old_result["p95_ms"], new_result["p95_ms"]) > threshold:
+            regressions.append(f"{name}: p95 regressed")
+        if new_result["errors"] > old_result["errors"]:
+            regressions.append(f"{name}: errors {old_result['errors']} -> {new_result['errors']}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="допустимый рост p95, %%")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    lines, regressions = compare(base, new, args.threshold)
+    print(f"base {base['meta'].get('commit', '')[:12]} -> new {new['meta'].get('commit', '')[:12]}")
+    for line in lines:
+        print(line)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
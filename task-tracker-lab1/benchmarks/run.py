@@ -0,0 +1,216 @@
+"""Нагрузочный прогон API по сценариям.
+
+Запуск из корня проекта (база заранее наполнена benchmarks.seed):
+
+    python -m benchmarks.run --database bench.db --output results.json
+    python -m benchmarks.run --base-url http://127.0.0.1:8000 --output results.json
+
+Без --base-url приложение работает в том же процессе через
+httpx.ASGITransport (rate limit отключается); с --base-url — запросы
+идут в запущенный uvicorn, лимиты задаются его окружением.
+
+Результат — JSON: для каждого сценария count, errors, p50/p95/p99/mean
+в миллисекундах и throughput (запросов в секунду).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+from benchmarks.seed import SEED_PASSWORD, database_url
+
+SCENARIOS = (
+    "login",
+    "list_tasks_deep_offset",
+    "list_tasks_keyset",
+    "get_task_include",
+    "create_comment",
+    "stats",
+)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    # nearest-rank
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    ms = [value * 1000 for value in latencies]
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else 0.0,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+async def run_scenario(client, make_request: Callable, requests: int, concurrency: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                response = await make_request(client)
+                ok = response.status_code < 400
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def build_scenarios(args, headers: Dict[str, str], rng: random.Random) -> Dict[str, Callable]:
+    from app.pagination import encode_cursor
+
+    limit = args.page_size
+    big = args.big_project_tasks
+    internal_headers = {"X-Internal-Key": args.internal_key}
+
+    def login(client):
+        user = rng.randint(1, args.users)
+        return client.post(
+            "/api/v1/auth/login",
+            json={"email": f"bench{user}@example.com", "password": SEED_PASSWORD},
+        )
+
+    def list_tasks_deep_offset(client):
+        offset = rng.randint(big // 2, max(big // 2, big - limit))
+        return client.get(f"/api/v1/projects/1/tasks?limit={limit}&offset={offset}", headers=headers)
+
+    def list_tasks_keyset(client):
+        # та же глубина, что и у offset, но через курсор
+        after = encode_cursor([rng.randint(big // 2, max(big // 2, big - limit))])
+        return client.get(f"/api/v1/projects/1/tasks?limit={limit}&after={after}", headers=headers)
+
+    def get_task_include(client):
+        task_id = rng.randint(1, big)
+        return client.get(f"/api/v2/tasks/{task_id}?include=project,comments", headers=headers)
+
+    def create_comment(client):
+        task_id = rng.randint(1, big)
+        return client.post(f"/api/v1/tasks/{task_id}/comments", json={"body": "bench"}, headers=headers)
+
+    def stats(client):
+        return client.get("/api/internal/stats", headers=internal_headers)
+
+    return {
+        "login": login,
+        "list_tasks_deep_offset": list_tasks_deep_offset,
+        "list_tasks_keyset": list_tasks_keyset,
+        "get_task_include": get_task_include,
+        "create_comment": create_comment,
+        "stats": stats,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+async def run(args) -> Dict:
+    import httpx
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        from app.main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    rng = random.Random(args.seed)
+    async with client:
+        resp = await client.post(
+            "/api/v1/auth/login", json={"email": "bench1@example.com", "password": SEED_PASSWORD}
+        )
+        resp.raise_for_status()
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        scenarios = build_scenarios(args, headers, rng)
+        results = {}
+        for name in args.scenarios:
+            make_request = scenarios[name]
+            requests = args.login_requests if name == "login" else args.requests
+            # прогрев: первые запросы заполняют пулы и кэши
+            for _ in range(min(args.warmup, requests)):
+                await make_request(client)
+            results[name] = await run_scenario(client, make_request, requests, args.concurrency)
+            print(f"{name}: {results[name]}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "mode": "http" if args.base_url else "asgi",
+            "database": args.base_url or os.environ.get("DATABASE_URL"),
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "page_size": args.page_size,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default="bench.db", help="файл SQLite или URL базы (режим ASGI)")
+    parser.add_argument("--base-url", help="адрес запущенного сервера вместо ASGI")
+    parser.add_argument("--output", help="куда записать JSON (по умолчанию stdout)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="запросов на сценарий")
+    parser.add_argument("--login-requests", type=int, default=50, help="запросов login (bcrypt дорогой)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--users", type=int, default=10000, help="как при seed")
+    parser.add_argument("--big-project-tasks", type=int, default=20000, help="как при seed")
+    parser.add_argument("--internal-key", default=os.getenv("INTERNAL_API_KEY", "int123"))
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not args.base_url:
+        if "://" not in args.database and not os.path.exists(args.database):
+            parser.error(f"{args.database} not found, run benchmarks.seed first")
+        os.environ["DATABASE_URL"] = database_url(args.database)
+        os.environ["RATE_LIMIT"] = str(10 ** 9)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
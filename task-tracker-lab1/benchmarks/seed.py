@@ -0,0 +1,139 @@
+"""Наполнение базы для бенчмарков.
+
+Запуск из корня проекта:
+
+    python -m benchmarks.seed --database bench.db [--users 10000 --tasks 100000 --comments 1000000]
+
+Пароль у всех пользователей один (SEED_PASSWORD), хэш считается один раз
+с текущим BCRYPT_ROUNDS, поэтому логин в бенчмарке стоит столько же,
+сколько в работе. Проект 1 пользователя 1 крупный (--big-project-tasks),
+на нём меряются глубокие offset.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+SEED_PASSWORD = "bench-password"
+CHUNK_SIZE = 10000
+STATUSES = ("open", "in_progress", "done")
+
+
+def database_url(database: str) -> str:
+    # путь к файлу -> SQLite, иначе это уже URL (например, postgresql://...)
+    return database if "://" in database else f"sqlite:///{database}"
+
+
+def _chunks(rows_iter, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows_iter:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def seed(users: int, projects: int, tasks: int, comments: int, big_project_tasks: int, seed_value: int = 42) -> dict:
+    # импорт после настройки DATABASE_URL
+    from sqlalchemy import insert
+
+    from app.auth import get_password_hash
+    from app.db import engine, init_db
+    from app.models import Comment, Project, Task, User
+
+    init_db()
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    password_hash = get_password_hash(SEED_PASSWORD)
+    projects = max(1, min(projects, users))
+    big_project_tasks = min(big_project_tasks, tasks)
+
+    def user_rows():
+        for i in range(1, users + 1):
+            yield {"id": i, "email": f"bench{i}@example.com", "name": f"User {i}",
+                   "password_hash": password_hash, "role": "user"}
+
+    def project_rows():
+        # проект i принадлежит пользователю i
+        for i in range(1, projects + 1):
+            yield {"id": i, "name": f"Project {i}", "description": None, "owner_id": i}
+
+    def project_for(task_id):
+        if task_id <= big_project_tasks or projects == 1:
+            return 1
+        return 2 + (task_id - big_project_tasks) % (projects - 1)
+
+    def task_rows():
+        for i in range(1, tasks + 1):
+            created = now - timedelta(minutes=tasks - i)
+            yield {
+                "id": i,
+                "title": f"Task {i}",
+                "description": "Benchmark task",
+                "project_id": project_for(i),
+                "assignee_id": rng.randint(1, users),
+                "status": rng.choice(STATUSES),
+                "priority": rng.randint(1, 5),
+                "created_at": created,
+                "updated_at": created,
+                "due_date": now + timedelta(days=rng.randint(-30, 60)),
+                "estimated_time_minutes": rng.choice((None, 15, 30, 60, 120)),
+            }
+
+    def comment_rows():
+        for i in range(1, comments + 1):
+            yield {
+                "id": i,
+                "task_id": rng.randint(1, tasks),
+                "author_id": rng.randint(1, users),
+                "body": f"Comment {i}",
+                "created_at": now - timedelta(seconds=comments - i),
+            }
+
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        for model, rows in (
+            (User, user_rows()),
+            (Project, project_rows()),
+            (Task, task_rows() if tasks else ()),
+            (Comment, comment_rows() if tasks else ()),
+        ):
+            for chunk in _chunks(rows):
+                conn.execute(insert(model.__table__), chunk)
+
+    return {
+        "users": users,
+        "projects": projects,
+        "tasks": tasks,
+        "comments": comments if tasks else 0,
+        "big_project_tasks": big_project_tasks,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", default="bench.db", help="файл SQLite или URL базы")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--projects", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--comments", type=int, default=1000000)
+    parser.add_argument("--big-project-tasks", type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    os.environ["DATABASE_URL"] = database_url(args.database)
+    if "://" not in args.database and os.path.exists(args.database):
+        parser.error(f"{args.database} already exists")
+
+    report = seed(args.users, args.projects, args.tasks, args.comments, args.big_project_tasks)
+    json.dump(report, sys.stdout)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
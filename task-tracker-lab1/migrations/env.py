@@ -0,0 +1,56 @@
+import re
+from logging.config import fileConfig
+
+from alembic import context
+from sqlmodel import SQLModel
+
+from app import models  # noqa: F401  регистрирует таблицы в metadata
+from app import search  # noqa: F401  индексы полнотекстового поиска
+from app import summary  # noqa: F401  триггеры сводки по проекту
+from app import counters  # noqa: F401  триггеры счётчиков /api/internal/stats
+from app.db import engine
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+
+# FTS5-таблицы поиска и их служебные таблицы создаёт миграция 0003, в
+# metadata их нет; без фильтра autogenerate предложит их удалить
+_FTS_TABLE = re.compile(r"^\w+_fts(_(data|idx|docsize|config|content))?$")
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == "table" and _FTS_TABLE.match(name))
+
+
+def run_migrations_offline():
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=engine.dialect.name == "sqlite",
+        include_object=include_object,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+            include_object=include_object,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
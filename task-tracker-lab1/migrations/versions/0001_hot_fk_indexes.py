@@ -0,0 +1,31 @@
+"""hot foreign-key indexes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# базы, созданные через init_db, уже могут содержать эти индексы
+INDEXES = [
+    ("ix_project_owner_id_id", "project", ["owner_id", "id"]),
+    ("ix_task_project_id_id", "task", ["project_id", "id"]),
+    ("ix_task_assignee_id", "task", ["assignee_id"]),
+    ("ix_comment_task_id_id", "comment", ["task_id", "id"]),
+    ("ix_comment_task_id_created_at", "comment", ["task_id", "created_at"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
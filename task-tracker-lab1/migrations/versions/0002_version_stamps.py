@@ -0,0 +1,53 @@
+"""version and updated_at stamps on project, task and comment
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (таблица, столбец); task.updated_at уже есть
+COLUMNS = [
+    ("project", sa.Column("version", sa.Integer(), nullable=False, server_default="1")),
+    ("project", sa.Column("updated_at", sa.DateTime(), nullable=True)),
+    ("task", sa.Column("version", sa.Integer(), nullable=False, server_default="1")),
+    ("comment", sa.Column("version", sa.Integer(), nullable=False, server_default="1")),
+    ("comment", sa.Column("updated_at", sa.DateTime(), nullable=True)),
+]
+
+
+# столбцы, которые в модели NOT NULL: добавляются nullable и ужесточаются после заполнения
+NOT_NULL = [("project", "updated_at"), ("comment", "updated_at")]
+
+
+def _columns(table):
+    return {c["name"]: c for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    # базы, созданные через init_db после этой версии моделей, уже содержат столбцы
+    for table, column in COLUMNS:
+        if column.name not in _columns(table):
+            op.add_column(table, column)
+
+    # для старых строк «последнее изменение» — момент создания
+    op.execute("UPDATE comment SET updated_at = created_at WHERE updated_at IS NULL")
+    op.execute("UPDATE project SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+
+    # batch: на SQLite ALTER COLUMN делается пересозданием таблицы
+    for table, name in NOT_NULL:
+        if _columns(table)[name]["nullable"]:
+            with op.batch_alter_table(table) as batch:
+                batch.alter_column(name, existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table, column in reversed(COLUMNS):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column(column.name)
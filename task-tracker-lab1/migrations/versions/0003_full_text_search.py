@@ -0,0 +1,87 @@
+"""full-text search over tasks and comments
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+# SQL зафиксирован в ревизии, а не импортируется из app.search: правки
+# приложения не должны менять то, что делает уже выпущенная миграция.
+# IF NOT EXISTS: база после init_db уже может содержать эти объекты
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+    "title, description, content='task', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO task_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+    "END",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5("
+    "body, content='comment', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS comment_fts_ai AFTER INSERT ON comment BEGIN "
+    "INSERT INTO comment_fts(rowid, body) VALUES (new.id, new.body); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS comment_fts_ad AFTER DELETE ON comment BEGIN "
+    "INSERT INTO comment_fts(comment_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS comment_fts_au AFTER UPDATE OF body ON comment BEGIN "
+    "INSERT INTO comment_fts(comment_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+    "INSERT INTO comment_fts(rowid, body) VALUES (new.id, new.body); "
+    "END",
+    # заполнить индекс из существующих строк
+    "INSERT INTO task_fts(task_fts) VALUES ('rebuild')",
+    "INSERT INTO comment_fts(comment_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS task_fts_ai",
+    "DROP TRIGGER IF EXISTS task_fts_ad",
+    "DROP TRIGGER IF EXISTS task_fts_au",
+    "DROP TABLE IF EXISTS task_fts",
+    "DROP TRIGGER IF EXISTS comment_fts_ai",
+    "DROP TRIGGER IF EXISTS comment_fts_ad",
+    "DROP TRIGGER IF EXISTS comment_fts_au",
+    "DROP TABLE IF EXISTS comment_fts",
+]
+
+# выражения совпадают с теми, что строит запрос поиска, иначе индекс не используется
+POSTGRES_UPGRADE = [
+    "CREATE INDEX IF NOT EXISTS ix_task_search ON task USING gin (("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')))",
+    "CREATE INDEX IF NOT EXISTS ix_comment_search ON comment USING gin (to_tsvector('simple', body))",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_task_search",
+    "DROP INDEX IF EXISTS ix_comment_search",
+]
+
+UPGRADE = {"sqlite": SQLITE_UPGRADE, "postgresql": POSTGRES_UPGRADE}
+DOWNGRADE = {"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE}
+
+
+def upgrade():
+    for statement in UPGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
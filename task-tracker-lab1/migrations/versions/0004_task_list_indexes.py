@@ -0,0 +1,30 @@
+"""composite indexes for filtered and sorted task lists
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_task_project_id_status_id", "task", ["project_id", "status", "id"]),
+    ("ix_task_project_id_assignee_id_id", "task", ["project_id", "assignee_id", "id"]),
+    ("ix_task_project_id_priority_id", "task", ["project_id", "priority", "id"]),
+    ("ix_task_project_id_due_date_id", "task", ["project_id", "due_date", "id"]),
+    ("ix_task_project_id_created_at_id", "task", ["project_id", "created_at", "id"]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
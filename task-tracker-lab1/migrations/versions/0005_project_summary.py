@@ -0,0 +1,160 @@
+"""project summary table maintained by triggers on task
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# SQL зафиксирован в ревизии, а не импортируется из app.summary: правки
+# приложения не должны менять то, что делает уже выпущенная миграция
+
+_UPSERT = """
+    INSERT INTO project_summary (project_id, dimension, value, task_count, estimated_minutes)
+    SELECT * FROM (
+        SELECT {row}.project_id AS project_id, 'status' AS dimension, {row}.status AS value,
+               {sign} AS task_count, {sign} * coalesce({row}.estimated_time_minutes, 0) AS estimated_minutes
+        UNION ALL
+        SELECT {row}.project_id, 'priority', CAST({row}.priority AS TEXT),
+               {sign}, {sign} * coalesce({row}.estimated_time_minutes, 0)
+        UNION ALL
+        SELECT {row}.project_id, 'assignee', coalesce(CAST({row}.assignee_id AS TEXT), ''),
+               {sign}, {sign} * coalesce({row}.estimated_time_minutes, 0)
+        UNION ALL
+        SELECT {row}.project_id, 'due', date({row}.due_date),
+               {sign}, {sign} * coalesce({row}.estimated_time_minutes, 0)
+        WHERE {row}.due_date IS NOT NULL AND {row}.status <> 'done'
+    ) AS delta WHERE project_id IS NOT NULL
+    ON CONFLICT (project_id, dimension, value) DO UPDATE SET
+        task_count = project_summary.task_count + excluded.task_count,
+        estimated_minutes = project_summary.estimated_minutes + excluded.estimated_minutes;
+    DELETE FROM project_summary WHERE project_id = {row}.project_id AND task_count = 0;
+"""
+
+SQLITE_UPGRADE = [
+    "CREATE TRIGGER IF NOT EXISTS task_summary_ai AFTER INSERT ON task BEGIN"
+    + _UPSERT.format(row="new", sign="1")
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS task_summary_ad AFTER DELETE ON task BEGIN"
+    + _UPSERT.format(row="old", sign="-1")
+    + "END",
+    "CREATE TRIGGER IF NOT EXISTS task_summary_au AFTER UPDATE OF "
+    "project_id, status, priority, assignee_id, estimated_time_minutes, due_date ON task BEGIN"
+    + _UPSERT.format(row="old", sign="-1")
+    + _UPSERT.format(row="new", sign="1")
+    + "END",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS task_summary_ai",
+    "DROP TRIGGER IF EXISTS task_summary_ad",
+    "DROP TRIGGER IF EXISTS task_summary_au",
+]
+
+POSTGRES_UPGRADE = [
+    """
+    CREATE OR REPLACE FUNCTION project_summary_apply(
+        p_project_id integer, p_status varchar, p_priority integer, p_assignee_id integer,
+        p_estimated_time_minutes integer, p_due_date timestamp, p_sign integer
+    ) RETURNS void AS $$
+    BEGIN
+        INSERT INTO project_summary (project_id, dimension, value, task_count, estimated_minutes)
+        SELECT * FROM (
+            SELECT p_project_id AS project_id, 'status' AS dimension, p_status AS value,
+                   p_sign AS task_count, p_sign * coalesce(p_estimated_time_minutes, 0) AS estimated_minutes
+            UNION ALL
+            SELECT p_project_id, 'priority', CAST(p_priority AS TEXT),
+                   p_sign, p_sign * coalesce(p_estimated_time_minutes, 0)
+            UNION ALL
+            SELECT p_project_id, 'assignee', coalesce(CAST(p_assignee_id AS TEXT), ''),
+                   p_sign, p_sign * coalesce(p_estimated_time_minutes, 0)
+            UNION ALL
+            SELECT p_project_id, 'due', to_char(p_due_date, 'YYYY-MM-DD'),
+                   p_sign, p_sign * coalesce(p_estimated_time_minutes, 0)
+            WHERE p_due_date IS NOT NULL AND p_status <> 'done'
+        ) AS delta WHERE project_id IS NOT NULL
+        ON CONFLICT (project_id, dimension, value) DO UPDATE SET
+            task_count = project_summary.task_count + excluded.task_count,
+            estimated_minutes = project_summary.estimated_minutes + excluded.estimated_minutes;
+        DELETE FROM project_summary WHERE project_id = p_project_id AND task_count = 0;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION task_summary_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM project_summary_apply(OLD.project_id, OLD.status, OLD.priority, OLD.assignee_id,
+                                          OLD.estimated_time_minutes, OLD.due_date, -1);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM project_summary_apply(NEW.project_id, NEW.status, NEW.priority, NEW.assignee_id,
+                                          NEW.estimated_time_minutes, NEW.due_date, 1);
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS task_summary ON task",
+    "CREATE TRIGGER task_summary AFTER INSERT OR DELETE OR UPDATE OF "
+    "project_id, status, priority, assignee_id, estimated_time_minutes, due_date ON task "
+    "FOR EACH ROW EXECUTE FUNCTION task_summary_trigger()",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS task_summary ON task",
+    "DROP FUNCTION IF EXISTS task_summary_trigger()",
+    "DROP FUNCTION IF EXISTS project_summary_apply(integer, varchar, integer, integer, integer, timestamp, integer)",
+]
+
+# начальное заполнение из существующих задач; {day} — день срока в диалекте
+_BACKFILL = """
+    INSERT INTO project_summary (project_id, dimension, value, task_count, estimated_minutes)
+    SELECT project_id, 'status', status, count(*), coalesce(sum(estimated_time_minutes), 0)
+    FROM task WHERE project_id IS NOT NULL GROUP BY project_id, status
+    UNION ALL
+    SELECT project_id, 'priority', CAST(priority AS TEXT), count(*), coalesce(sum(estimated_time_minutes), 0)
+    FROM task WHERE project_id IS NOT NULL GROUP BY project_id, priority
+    UNION ALL
+    SELECT project_id, 'assignee', coalesce(CAST(assignee_id AS TEXT), ''), count(*),
+           coalesce(sum(estimated_time_minutes), 0)
+    FROM task WHERE project_id IS NOT NULL GROUP BY project_id, assignee_id
+    UNION ALL
+    SELECT project_id, 'due', {day}, count(*), coalesce(sum(estimated_time_minutes), 0)
+    FROM task WHERE project_id IS NOT NULL AND due_date IS NOT NULL AND status <> 'done'
+    GROUP BY project_id, {day}
+"""
+
+UPGRADE = {
+    "sqlite": SQLITE_UPGRADE + [_BACKFILL.format(day="date(due_date)")],
+    "postgresql": POSTGRES_UPGRADE + [_BACKFILL.format(day="to_char(due_date, 'YYYY-MM-DD')")],
+}
+DOWNGRADE = {"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE}
+
+
+def upgrade():
+    bind = op.get_bind()
+    # база после init_db уже содержит таблицу, триггеры и заполненные строки
+    if sa.inspect(bind).has_table("project_summary"):
+        return
+    op.create_table(
+        "project_summary",
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("dimension", sa.String(), nullable=False),
+        sa.Column("value", sa.String(), nullable=False),
+        sa.Column("task_count", sa.Integer(), nullable=False),
+        sa.Column("estimated_minutes", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("project_id", "dimension", "value"),
+    )
+    for statement in UPGRADE.get(bind.dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+    op.drop_table("project_summary")
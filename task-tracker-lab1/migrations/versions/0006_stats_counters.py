@@ -0,0 +1,143 @@
+"""stats counters maintained by triggers
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# SQL зафиксирован в ревизии, а не импортируется из app.counters: правки
+# приложения не должны менять то, что делает уже выпущенная миграция
+
+# (таблица, счётчик)
+TABLES = [
+    ("user", "total_users"),
+    ("project", "total_projects"),
+    ("task", "total_tasks"),
+    ("comment", "total_comments"),
+]
+
+_BUMP = (
+    "INSERT INTO stats_counter (name, key, value) VALUES ({name}, {key}, {delta}) "
+    "ON CONFLICT (name, key) DO UPDATE SET value = stats_counter.value + excluded.value; "
+)
+
+SQLITE_UPGRADE = []
+for _table, _name in TABLES:
+    SQLITE_UPGRADE += [
+        f'CREATE TRIGGER IF NOT EXISTS {_table}_counter_ai AFTER INSERT ON "{_table}" BEGIN '
+        + _BUMP.format(name=f"'{_name}'", key="''", delta=1)
+        + (_BUMP.format(name="'tasks_by_status'", key="new.status", delta=1) if _table == "task" else "")
+        + "END",
+        f'CREATE TRIGGER IF NOT EXISTS {_table}_counter_ad AFTER DELETE ON "{_table}" BEGIN '
+        + _BUMP.format(name=f"'{_name}'", key="''", delta=-1)
+        + (_BUMP.format(name="'tasks_by_status'", key="old.status", delta=-1) if _table == "task" else "")
+        + "END",
+    ]
+SQLITE_UPGRADE.append(
+    "CREATE TRIGGER IF NOT EXISTS task_counter_au AFTER UPDATE OF status ON task "
+    "WHEN old.status IS NOT new.status BEGIN "
+    + _BUMP.format(name="'tasks_by_status'", key="old.status", delta=-1)
+    + _BUMP.format(name="'tasks_by_status'", key="new.status", delta=1)
+    + "END"
+)
+
+SQLITE_DOWNGRADE = [
+    f"DROP TRIGGER IF EXISTS {_table}_counter_{_event}" for _table, _ in TABLES for _event in ("ai", "ad")
+] + ["DROP TRIGGER IF EXISTS task_counter_au"]
+
+POSTGRES_UPGRADE = [
+    """
+    CREATE OR REPLACE FUNCTION stats_counter_bump(p_name varchar, p_key varchar, p_delta integer)
+    RETURNS void AS $$
+    BEGIN
+        INSERT INTO stats_counter (name, key, value) VALUES (p_name, p_key, p_delta)
+        ON CONFLICT (name, key) DO UPDATE SET value = stats_counter.value + excluded.value;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION stats_counter_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM stats_counter_bump(TG_ARGV[0], '', 1);
+        ELSE
+            PERFORM stats_counter_bump(TG_ARGV[0], '', -1);
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION task_status_counter_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'UPDATE' AND OLD.status IS NOT DISTINCT FROM NEW.status THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM stats_counter_bump('tasks_by_status', OLD.status, -1);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM stats_counter_bump('tasks_by_status', NEW.status, 1);
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+]
+for _table, _name in TABLES:
+    POSTGRES_UPGRADE += [
+        f'DROP TRIGGER IF EXISTS {_table}_counter ON "{_table}"',
+        f'CREATE TRIGGER {_table}_counter AFTER INSERT OR DELETE ON "{_table}" '
+        f"FOR EACH ROW EXECUTE FUNCTION stats_counter_trigger('{_name}')",
+    ]
+POSTGRES_UPGRADE += [
+    "DROP TRIGGER IF EXISTS task_status_counter ON task",
+    "CREATE TRIGGER task_status_counter AFTER INSERT OR DELETE OR UPDATE OF status ON task "
+    "FOR EACH ROW EXECUTE FUNCTION task_status_counter_trigger()",
+]
+
+POSTGRES_DOWNGRADE = [f'DROP TRIGGER IF EXISTS {_table}_counter ON "{_table}"' for _table, _ in TABLES] + [
+    "DROP TRIGGER IF EXISTS task_status_counter ON task",
+    "DROP FUNCTION IF EXISTS task_status_counter_trigger()",
+    "DROP FUNCTION IF EXISTS stats_counter_trigger()",
+    "DROP FUNCTION IF EXISTS stats_counter_bump(varchar, varchar, integer)",
+]
+
+# начальное заполнение из существующих строк
+BACKFILL = """
+    INSERT INTO stats_counter (name, key, value)
+    SELECT 'total_users', '', count(*) FROM "user"
+    UNION ALL SELECT 'total_projects', '', count(*) FROM "project"
+    UNION ALL SELECT 'total_tasks', '', count(*) FROM "task"
+    UNION ALL SELECT 'total_comments', '', count(*) FROM "comment"
+    UNION ALL SELECT 'tasks_by_status', status, count(*) FROM task GROUP BY status
+"""
+
+UPGRADE = {"sqlite": SQLITE_UPGRADE + [BACKFILL], "postgresql": POSTGRES_UPGRADE + [BACKFILL]}
+DOWNGRADE = {"sqlite": SQLITE_DOWNGRADE, "postgresql": POSTGRES_DOWNGRADE}
+
+
+def upgrade():
+    bind = op.get_bind()
+    # база после init_db уже содержит таблицу, триггеры и заполненные строки
+    if sa.inspect(bind).has_table("stats_counter"):
+        return
+    op.create_table(
+        "stats_counter",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("value", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name", "key"),
+    )
+    for statement in UPGRADE.get(bind.dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+    op.drop_table("stats_counter")
@@ -0,0 +1,62 @@
+import threading
+
+import fakeredis
+import pytest
+
+from app import redis_client
+from app.backends import Backend, redis_factory
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class Store:
+    def __init__(self, blocking=False):
+        self.blocking = blocking
+        self.closed = False
+
+    def thread(self):
+        return threading.current_thread()
+
+    def close(self):
+        self.closed = True
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown cache backend: memcached"):
+        Backend("cache", {"memory": Store}, "memcached")
+
+
+def test_redis_factory_uses_shared_client(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis_client, "_client", client)
+
+    class RedisStore(Store):
+        def __init__(self, client, prefix):
+            super().__init__(blocking=True)
+            self.client = client
+            self.prefix = prefix
+
+    backend = Backend("cache", {"redis": redis_factory(RedisStore, prefix="x:")}, "redis")
+    assert backend.store.client is client
+    assert backend.store.prefix == "x:"
+
+
+def test_set_closes_previous_store():
+    backend = Backend("cache", {"memory": Store}, "memory")
+    previous, replacement = backend.store, Store()
+
+    backend.set(replacement)
+    assert previous.closed and not replacement.closed
+    assert backend.store is replacement
+
+
+@pytest.mark.anyio
+async def test_blocking_store_runs_in_worker_thread():
+    backend = Backend("cache", {"memory": Store, "redis": lambda: Store(blocking=True)}, "memory")
+    assert await backend.call("thread") is threading.current_thread()
+
+    backend.set(backend.create("redis"))
+    assert await backend.call("thread") is not threading.current_thread()
@@ -0,0 +1,110 @@
+import time
+
+import fakeredis
+import pytest
+from fastapi import HTTPException
+
+from app import idempotency
+from app.idempotency import MemoryIdempotencyStore, RedisIdempotencyStore
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def memory_store():
+    # без фонового потока: sweep вызывается в тестах явно
+    store = MemoryIdempotencyStore(max_keys=3, sweep_interval=0)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def redis_store():
+    return RedisIdempotencyStore(fakeredis.FakeRedis())
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request, memory_store, redis_store, monkeypatch):
+    store = memory_store if request.param == "memory" else redis_store
+    # set_store закрыл бы общий store модуля; подменяем только на время теста
+    monkeypatch.setattr(idempotency._backend, "store", store)
+    return store
+
+
+def test_memory_evicts_least_recently_used_at_capacity(memory_store):
+    for key in ("a", "b", "c"):
+        memory_store.set(key, "fp", key, ttl=60)
+    # чтение делает "a" свежей, вытесняется "b"
+    assert memory_store.get("a") == ("fp", "a")
+    memory_store.set("d", "fp", "d", ttl=60)
+
+    assert memory_store.get("b") is None
+    assert [memory_store.get(key) for key in ("a", "c", "d")] == [("fp", "a"), ("fp", "c"), ("fp", "d")]
+    assert len(memory_store._data) == 3
+
+
+def test_memory_sweep_removes_expired_entries(memory_store, monkeypatch):
+    memory_store.set("short", "fp", 1, ttl=10)
+    memory_store.set("long", "fp", 2, ttl=1000)
+    now = time.time()
+    monkeypatch.setattr(idempotency.time, "time", lambda: now + 100)
+
+    assert memory_store.sweep() == 1
+    assert "short" not in memory_store._data
+    assert memory_store.get("long") == ("fp", 2)
+
+
+def test_memory_background_sweep_removes_expired_entries():
+    store = MemoryIdempotencyStore(max_keys=10, sweep_interval=0.01)
+    try:
+        store.set("expired", "fp", 1, ttl=-1)
+        deadline = time.time() + 2
+        while store._data and time.time() < deadline:
+            time.sleep(0.01)
+        assert not store._data
+    finally:
+        store.close()
+
+
+def test_redis_entries_expire_by_ttl(redis_store):
+    # истечение в Redis — SET ... EX, отдельного sweep нет
+    redis_store.set("key", "fp", {"id": 1}, ttl=1)
+
+    assert redis_store.get("key") == ("fp", {"id": 1})
+    assert redis_store.client.ttl("idemp:key") == 1
+    time.sleep(1.1)
+    assert redis_store.get("key") is None
+    assert redis_store.sweep() == 0
+
+
+@pytest.mark.anyio
+async def test_replay_returns_stored_value(store):
+    fingerprint = idempotency.request_fingerprint("POST", "/tasks", {"title": "a"})
+    await idempotency.set_key("k1", 1, fingerprint, {"id": 7})
+
+    assert await idempotency.get_key("k1", 1, fingerprint) == {"id": 7}
+
+
+@pytest.mark.anyio
+async def test_fingerprint_mismatch_is_422(store):
+    await idempotency.set_key("k1", 1, idempotency.request_fingerprint({"title": "a"}), {"id": 7})
+
+    with pytest.raises(HTTPException) as exc:
+        await idempotency.get_key("k1", 1, idempotency.request_fingerprint({"title": "b"}))
+    assert exc.value.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_keys_are_scoped_per_user(store):
+    fingerprint = idempotency.request_fingerprint({"title": "a"})
+    await idempotency.set_key("same", 1, fingerprint, {"id": 1})
+    await idempotency.set_key("same", 2, fingerprint, {"id": 2})
+
+    assert await idempotency.get_key("same", 1, fingerprint) == {"id": 1}
+    assert await idempotency.get_key("same", 2, fingerprint) == {"id": 2}
+    assert await idempotency.get_key("same", 3, fingerprint) is None
+    # другой запрос под тем же ключом у другого пользователя — не конфликт
+    assert await idempotency.get_key("same", 3, idempotency.request_fingerprint({"title": "b"})) is None
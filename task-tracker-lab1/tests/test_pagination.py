@@ -0,0 +1,93 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import create_engine
+from sqlmodel import Session, SQLModel, select
+from starlette.requests import Request
+
+from app.models import Task
+from app.pagination import encode_cursor, paginate_sorted, set_next_cursor
+from app.task_filters import TASK_SORTS
+
+PROJECT_ID = 1
+
+
+@pytest.fixture(scope="module")
+def session():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[Task.__table__])
+    rnd = random.Random(24)
+    base = datetime(2026, 1, 1)
+    with Session(engine) as session:
+        # мало различных значений: почти каждый ключ повторяется, порядок
+        # внутри групп задаёт только id; у части задач due_date = NULL
+        for i in range(40):
+            session.add(
+                Task(
+                    title=f"t{i}",
+                    project_id=PROJECT_ID,
+                    priority=rnd.randint(1, 3),
+                    created_at=base + timedelta(hours=rnd.randint(0, 2)),
+                    due_date=rnd.choice([None, base + timedelta(days=rnd.randint(0, 2))]),
+                )
+            )
+        # задача другого проекта не должна попадать в выдачу
+        session.add(Task(title="other", project_id=PROJECT_ID + 1))
+        session.commit()
+        yield session
+    engine.dispose()
+
+
+def _request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/tasks", "query_string": b"", "headers": []})
+
+
+def _expected(session, sort) -> list:
+    tasks = session.exec(select(Task).where(Task.project_id == PROJECT_ID)).all()
+    present = [t for t in tasks if getattr(t, sort.attr) is not None]
+    missing = [t for t in tasks if getattr(t, sort.attr) is None]
+    present.sort(key=lambda t: (getattr(t, sort.attr), t.id), reverse=sort.descending)
+    missing.sort(key=lambda t: t.id, reverse=sort.descending)
+    return [t.id for t in present + missing]
+
+
+def _walk(session, sort, limit: int) -> list:
+    ids, after = [], None
+    while True:
+        stmt = paginate_sorted(select(Task).where(Task.project_id == PROJECT_ID), sort, limit, 0, after)
+        page = session.exec(stmt).all()
+        ids += [t.id for t in page]
+        after = set_next_cursor(_request(), Response(), page, limit, sort)
+        if after is None:
+            return ids
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 40])
+@pytest.mark.parametrize("name", list(TASK_SORTS))
+def test_keyset_walk_matches_full_order(session, name, limit):
+    sort = TASK_SORTS[name]
+    assert _walk(session, sort, limit) == _expected(session, sort)
+
+
+@pytest.mark.parametrize("name", list(TASK_SORTS))
+def test_offset_page_matches_full_order(session, name):
+    sort = TASK_SORTS[name]
+    stmt = paginate_sorted(select(Task).where(Task.project_id == PROJECT_ID), sort, 5, 10, None)
+    assert [t.id for t in session.exec(stmt).all()] == _expected(session, sort)[10:15]
+
+
+def test_cursor_of_other_sort_is_rejected(session):
+    page = session.exec(paginate_sorted(select(Task), TASK_SORTS["priority"], 2, 0, None)).all()
+    cursor = set_next_cursor(_request(), Response(), page, 2, TASK_SORTS["priority"])
+    with pytest.raises(HTTPException) as exc:
+        paginate_sorted(select(Task), TASK_SORTS["-priority"], 2, 0, cursor)
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("values", [["due_date", "not a date", 1], ["priority", 1, "1"], ["priority", 1]])
+def test_malformed_cursor_is_rejected(values):
+    with pytest.raises(HTTPException) as exc:
+        paginate_sorted(select(Task), TASK_SORTS[values[0]], 2, 0, encode_cursor(values))
+    assert exc.value.status_code == 400
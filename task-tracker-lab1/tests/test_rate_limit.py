@@ -0,0 +1,104 @@
+import time
+
+import fakeredis
+import pytest
+
+from app import rate_limit
+from app.rate_limit import MemoryRateLimiter, RedisRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def redis_client():
+    # lupa (fakeredis[lua]) выполняет тот же Lua-скрипт, что и Redis
+    return fakeredis.FakeRedis()
+
+
+def _drain(limiter, identifier, count):
+    return [limiter.hit(identifier) for _ in range(count)]
+
+
+def test_memory_allows_burst_up_to_limit(clock):
+    limiter = MemoryRateLimiter(limit=3, window=60)
+
+    assert _drain(limiter, "user:1", 3) == [(True, 2, 0), (True, 1, 0), (True, 0, 0)]
+    # один токен пополняется за window / limit = 20 секунд
+    assert limiter.hit("user:1") == (False, 0, 20)
+
+
+def test_memory_refills_at_limit_per_window(clock):
+    limiter = MemoryRateLimiter(limit=3, window=60)
+    _drain(limiter, "user:1", 3)
+
+    clock.now += 10
+    allowed, _, retry_after = limiter.hit("user:1")
+    assert (allowed, retry_after) == (False, 10)
+
+    clock.now += 10
+    assert limiter.hit("user:1") == (True, 0, 0)
+
+    # пополнение не превышает limit: после долгого простоя снова только burst
+    clock.now += 3600
+    assert [allowed for allowed, _, _ in _drain(limiter, "user:1", 4)] == [True, True, True, False]
+
+
+def test_memory_buckets_are_per_identifier(clock):
+    limiter = MemoryRateLimiter(limit=1, window=60)
+
+    assert limiter.hit("user:1")[0]
+    assert not limiter.hit("user:1")[0]
+    assert limiter.hit("user:2")[0]
+
+
+def test_memory_evicts_idle_and_excess_buckets(clock):
+    limiter = MemoryRateLimiter(limit=5, window=60, max_clients=2)
+    for identifier in ("a", "b", "c"):
+        limiter.hit(identifier)
+    assert list(limiter._buckets) == ["b", "c"]
+
+    # бакет, простоявший окно, полон: его удаление ничего не меняет
+    clock.now += 61
+    limiter.hit("d")
+    assert list(limiter._buckets) == ["d"]
+
+
+def test_redis_allows_burst_up_to_limit(redis_client):
+    limiter = RedisRateLimiter(redis_client, limit=3, window=60)
+
+    assert _drain(limiter, "user:1", 3) == [(True, 2, 0), (True, 1, 0), (True, 0, 0)]
+    allowed, remaining, retry_after = limiter.hit("user:1")
+    assert (allowed, remaining) == (False, 0)
+    assert 1 <= retry_after <= 20
+    assert limiter.hit("user:2") == (True, 2, 0)
+
+
+def test_redis_refills_over_time(redis_client):
+    # 2 токена в секунду: пауза 0.6 с возвращает один токен
+    limiter = RedisRateLimiter(redis_client, limit=2, window=1)
+    assert [allowed for allowed, _, _ in _drain(limiter, "user:1", 3)] == [True, True, False]
+
+    time.sleep(0.6)
+    assert [allowed for allowed, _, _ in _drain(limiter, "user:1", 2)] == [True, False]
+
+
+def test_redis_bucket_state_and_ttl(redis_client):
+    limiter = RedisRateLimiter(redis_client, limit=3, window=60)
+    limiter.hit("user:1")
+
+    bucket = redis_client.hgetall("rl:user:1")
+    assert float(bucket[b"tokens"]) == pytest.approx(2, abs=0.01)
+    assert 0 < redis_client.ttl("rl:user:1") <= 60
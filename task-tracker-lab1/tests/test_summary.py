@@ -0,0 +1,130 @@
+import importlib.util
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, delete, update
+from sqlmodel import Session, SQLModel, select
+
+from app import summary  # noqa: F401  триггеры project_summary для init_db
+from app.models import ProjectSummary, Task
+
+REVISION = Path(__file__).resolve().parent.parent / "migrations" / "versions" / "0005_project_summary.py"
+BASE = datetime(2026, 3, 1, 9, 30)
+
+
+def _load_revision():
+    spec = importlib.util.spec_from_file_location("revision_0005", REVISION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _random_fields(rnd: random.Random) -> dict:
+    return {
+        "project_id": rnd.choice([1, 2, 3, None]),
+        "status": rnd.choice(["open", "in_progress", "done"]),
+        "priority": rnd.randint(1, 4),
+        "assignee_id": rnd.choice([None, 1, 2]),
+        "estimated_time_minutes": rnd.choice([None, 15, 30, 90]),
+        "due_date": rnd.choice([None, BASE + timedelta(days=rnd.randint(-2, 2), hours=rnd.randint(0, 20))]),
+    }
+
+
+def _expected(session) -> dict:
+    # то же, что собирают триггеры, но группировкой по текущим строкам task
+    rows = defaultdict(lambda: [0, 0])
+    for task in session.exec(select(Task).where(Task.project_id.is_not(None))).all():
+        minutes = task.estimated_time_minutes or 0
+        keys = [
+            ("status", task.status),
+            ("priority", str(task.priority)),
+            ("assignee", "" if task.assignee_id is None else str(task.assignee_id)),
+        ]
+        if task.due_date is not None and task.status != summary.DONE_STATUS:
+            keys.append(("due", task.due_date.strftime("%Y-%m-%d")))
+        for dimension, value in keys:
+            row = rows[(task.project_id, dimension, value)]
+            row[0] += 1
+            row[1] += minutes
+    return {key: tuple(value) for key, value in rows.items()}
+
+
+def _actual(session) -> dict:
+    return {
+        (row.project_id, row.dimension, row.value): (row.task_count, row.estimated_minutes)
+        for row in session.exec(select(ProjectSummary)).all()
+    }
+
+
+def _create_summary_by_init_db(engine):
+    SQLModel.metadata.create_all(engine, tables=[ProjectSummary.__table__])
+
+
+def _create_summary_by_migration(engine):
+    revision = _load_revision()
+    with engine.begin() as conn:
+        with Operations.context(MigrationContext.configure(conn)):
+            revision.upgrade()
+
+
+@pytest.fixture(params=["init_db", "migration"])
+def engine(request, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'summary.db'}")
+    SQLModel.metadata.create_all(engine, tables=[Task.__table__])
+    # задачи до создания сводки: проверяется и начальное заполнение
+    rnd = random.Random(25)
+    with Session(engine) as session:
+        session.add_all([Task(title=f"seed{i}", **_random_fields(rnd)) for i in range(15)])
+        session.commit()
+    if request.param == "init_db":
+        _create_summary_by_init_db(engine)
+    else:
+        _create_summary_by_migration(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_summary_matches_group_by_after_random_writes(engine):
+    rnd = random.Random(2025)
+    with Session(engine) as session:
+        assert _actual(session) == _expected(session)
+        for step in range(300):
+            ids = session.exec(select(Task.id)).all()
+            op = rnd.choice(["create", "update", "update", "delete", "bulk_update", "bulk_delete"])
+            if op == "create" or not ids:
+                session.add(Task(title=f"t{step}", **_random_fields(rnd)))
+            elif op == "update":
+                task = session.get(Task, rnd.choice(ids))
+                fields = _random_fields(rnd)
+                for name in rnd.sample(sorted(fields), rnd.randint(1, 3)):
+                    setattr(task, name, fields[name])
+                session.add(task)
+            elif op == "delete":
+                session.delete(session.get(Task, rnd.choice(ids)))
+            elif op == "bulk_update":
+                # мимо ORM, как batch-эндпоинты
+                chosen = rnd.sample(ids, min(len(ids), rnd.randint(1, 5)))
+                fields = _random_fields(rnd)
+                name = rnd.choice(sorted(fields))
+                session.exec(update(Task).where(Task.id.in_(chosen)).values({name: fields[name]}))
+            else:
+                chosen = rnd.sample(ids, min(len(ids), rnd.randint(1, 3)))
+                session.exec(delete(Task).where(Task.id.in_(chosen)))
+            session.commit()
+            session.expunge_all()
+            assert _actual(session) == _expected(session), (step, op)
+
+
+def test_rollback_leaves_summary_unchanged(engine):
+    with Session(engine) as session:
+        before = _actual(session)
+        session.add(Task(title="rolled back", project_id=1, status="open", estimated_time_minutes=5))
+        session.exec(delete(Task).where(Task.project_id == 2))
+        session.flush()
+        session.rollback()
+        assert _actual(session) == before == _expected(session)